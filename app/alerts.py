@@ -0,0 +1,309 @@
+"""
+Durable alert delivery through a Redis Stream.
+
+The ingestion path publishes each alert once to the "alerts" stream. A Lua
+script first records (instrument, ts, signal) in the instrument's
+"{instrument}:alert_index" sorted set and drops the alert if it is already
+there, so replays, reconnect backfills and repeated candle updates never
+deliver twice.
+
+Each configured sink (ALERT_SINKS, comma separated: log, webhook, stub)
+reads the stream through its own consumer group, "alerts:{sink}", so sinks
+progress and fail independently. Alerts are delivered in batches, retried
+with backoff, and acknowledged only once the sink accepts them; entries left
+pending by a failed or crashed consumer are reclaimed after
+ALERT_CLAIM_IDLE_MS and dead-lettered to "alerts:dead" after
+ALERT_MAX_DELIVERIES attempts.
+"""
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from collections import deque
+import httpx
+from redis.exceptions import RedisError, ResponseError
+from app import metrics
+from app.logging import log_info, log_warning
+from app.redis import redisClient
+from app.redis_writer import redis_writer
+
+ALERT_STREAM = "alerts"
+DEAD_LETTER_STREAM = "alerts:dead"
+ALERT_STREAM_MAXLEN = int(os.getenv("ALERT_STREAM_MAXLEN", "100000"))
+ALERT_DEDUP_SECONDS = int(os.getenv("ALERT_DEDUP_SECONDS", str(7 * 24 * 3600)))
+
+ALERT_SINKS = os.getenv("ALERT_SINKS", "log")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "100"))
+ALERT_BLOCK_MS = int(os.getenv("ALERT_BLOCK_MS", "1000"))
+ALERT_RETRIES = int(os.getenv("ALERT_RETRIES", "3"))
+ALERT_RETRY_BACKOFF = float(os.getenv("ALERT_RETRY_BACKOFF", "0.5"))
+ALERT_CLAIM_IDLE_MS = int(os.getenv("ALERT_CLAIM_IDLE_MS", "30000"))
+ALERT_MAX_DELIVERIES = int(os.getenv("ALERT_MAX_DELIVERIES", "10"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+alerts_published = metrics.counter("alerts_published_total", "Alerts queued for the alert stream (before deduplication)")
+alerts_delivered = metrics.counter("alerts_delivered_total", "Alerts acknowledged by a sink")
+alerts_dead_lettered = metrics.counter("alerts_dead_lettered_total", "Alerts moved to the dead-letter stream")
+sink_errors = metrics.counter("alert_sink_errors_total", "Failed sink deliveries (each retry counts)")
+delivery_latency = metrics.histogram("alert_delivery_seconds", "Time from publishing an alert to its acknowledgement by a sink")
+delivery_batch_size = metrics.histogram("alert_delivery_batch_size", "Alerts per sink delivery", BATCH_SIZE_BUCKETS)
+
+# KEYS: dedup index, stream. ARGV: ts, index member, dedup horizon, stream maxlen, field/value pairs...
+PUBLISH_LUA = """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. (tonumber(ARGV[1]) - tonumber(ARGV[3])))
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', unpack(ARGV, 5))
+return 1
+"""
+
+publish_script = redisClient.register_script(PUBLISH_LUA)
+
+
+class AlertQueue:
+    """
+    Producer side: queues deduplicated alerts onto the stream through the
+    batched Redis writer.
+    """
+
+    def __init__(self, writer, stream=ALERT_STREAM, maxlen=ALERT_STREAM_MAXLEN, dedup_seconds=ALERT_DEDUP_SECONDS):
+        self.writer = writer
+        self.stream = stream
+        self.maxlen = maxlen
+        self.dedup_seconds = dedup_seconds
+
+    def publish(self, instrument_key, ts_sec, alert):
+        """
+        Queues one alert ({"signal", "text"}) for the candle at ts_sec.
+        """
+        alerts_published.inc()
+        keys = [f"{instrument_key}:alert_index", self.stream]
+        args = [
+            ts_sec, f"{ts_sec}:{alert['signal']}", self.dedup_seconds, self.maxlen,
+            "instrument", instrument_key,
+            "time", ts_sec,
+            "signal", alert["signal"],
+            "text", alert["text"],
+            "created_at", repr(time.time()),
+        ]
+        self.writer.enqueue(lambda pipe: publish_script(keys=keys, args=args, client=pipe))
+
+
+def decode_alert(entry_id, fields):
+    fields = {key.decode(): value.decode() for key, value in fields.items()}
+    return {
+        "id": entry_id.decode() if isinstance(entry_id, bytes) else entry_id,
+        "instrument": fields["instrument"],
+        "time": int(fields["time"]),
+        "signal": fields["signal"],
+        "text": fields["text"],
+        "created_at": float(fields["created_at"]),
+    }
+
+
+class LogSink:
+    """
+    Writes each alert to the application log.
+    """
+    name = "log"
+
+    async def send(self, alerts):
+        for alert in alerts:
+            log_info("ALERT %s %s at %s: %s", alert["instrument"], alert["signal"], alert["time"], alert["text"])
+
+    async def close(self):
+        pass
+
+
+class WebhookSink:
+    """
+    POSTs each batch as {"alerts": [...]} to a URL. Non-2xx responses fail
+    the batch so it is retried.
+    """
+    name = "webhook"
+
+    def __init__(self, url, timeout=10.0):
+        if not url:
+            raise ValueError("The webhook alert sink needs ALERT_WEBHOOK_URL")
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, alerts):
+        response = await self._client.post(self.url, json={"alerts": alerts})
+        response.raise_for_status()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class StubSink:
+    """
+    Keeps the most recent deliveries in memory as (received_at, alert), for
+    local runs and benchmarks. fail_rate makes that share of batches fail.
+    """
+    name = "stub"
+
+    def __init__(self, fail_rate=0.0, keep=100_000):
+        self.fail_rate = fail_rate
+        self.received = deque(maxlen=keep)
+
+    async def send(self, alerts):
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RuntimeError("stub sink failure")
+        received_at = time.time()
+        self.received.extend((received_at, alert) for alert in alerts)
+
+    async def close(self):
+        pass
+
+
+def build_sinks(names=ALERT_SINKS):
+    sinks = []
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        if name == LogSink.name:
+            sinks.append(LogSink())
+        elif name == WebhookSink.name:
+            sinks.append(WebhookSink(ALERT_WEBHOOK_URL))
+        elif name == StubSink.name:
+            sinks.append(StubSink())
+        else:
+            raise ValueError(f"Unknown alert sink {name!r}, expected log, webhook or stub")
+    return sinks
+
+
+class AlertDispatcher:
+    """
+    Delivers the alert stream to one sink via the sink's consumer group.
+
+    Any number of processes can run a dispatcher for the same sink; the
+    consumer group splits the stream between them.
+    """
+
+    def __init__(self, client, sink, stream=ALERT_STREAM, batch_size=ALERT_BATCH_SIZE, block_ms=ALERT_BLOCK_MS,
+                 retries=ALERT_RETRIES, backoff=ALERT_RETRY_BACKOFF, claim_idle_ms=ALERT_CLAIM_IDLE_MS,
+                 max_deliveries=ALERT_MAX_DELIVERIES):
+        self.client = client
+        self.sink = sink
+        self.stream = stream
+        self.group = f"alerts:{sink.name}"
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.retries = retries
+        self.backoff = backoff
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self._next_claim = 0.0
+        self._group_ready = False
+
+    async def ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def run(self):
+        while True:
+            try:
+                await self.ensure_group()
+                while True:
+                    entries = await self._claim_stale() or await self._read_new()
+                    if entries:
+                        await self._deliver(entries)
+            except RedisError as e:
+                log_warning("Alert dispatcher for %s lost Redis: %s", self.sink.name, e)
+                # The stream (and its groups) may be gone, e.g. after a Redis restart
+                self._group_ready = False
+                await asyncio.sleep(1)
+
+    async def _read_new(self):
+        response = await self.client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms,
+        )
+        return response[0][1] if response else []
+
+    async def _claim_stale(self):
+        """
+        Takes over entries another delivery attempt left unacknowledged,
+        dead-lettering those that have failed too often.
+        """
+        now = time.monotonic()
+        if now < self._next_claim:
+            return []
+        self._next_claim = now + self.claim_idle_ms / 1000
+
+        _, entries, *_ = await self.client.xautoclaim(
+            self.stream, self.group, self.consumer, self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+        )
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries:
+            return []
+
+        pending = await self.client.xpending_range(
+            self.stream, self.group, min=entries[0][0], max=entries[-1][0], count=len(entries), consumername=self.consumer,
+        )
+        exhausted = {item["message_id"] for item in pending if item["times_delivered"] > self.max_deliveries}
+        if exhausted:
+            pipe = self.client.pipeline(transaction=True)
+            for entry_id, fields in entries:
+                if entry_id in exhausted:
+                    pipe.xadd(DEAD_LETTER_STREAM, {**fields, b"group": self.group}, maxlen=ALERT_STREAM_MAXLEN, approximate=True)
+            pipe.xack(self.stream, self.group, *exhausted)
+            await pipe.execute()
+            alerts_dead_lettered.inc(len(exhausted))
+        return [(entry_id, fields) for entry_id, fields in entries if entry_id not in exhausted]
+
+    async def _deliver(self, entries):
+        alerts = [decode_alert(entry_id, fields) for entry_id, fields in entries]
+        for attempt in range(self.retries + 1):
+            try:
+                await self.sink.send(alerts)
+                break
+            except Exception as e:
+                sink_errors.inc()
+                log_warning("Alert sink %s failed on %d alerts (attempt %d): %s", self.sink.name, len(alerts), attempt + 1, e)
+                if attempt == self.retries:
+                    # Left pending; reclaimed after claim_idle_ms
+                    return
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        await self.client.xack(self.stream, self.group, *(entry_id for entry_id, _ in entries))
+        acked_at = time.time()
+        for alert in alerts:
+            delivery_latency.observe(acked_at - alert["created_at"])
+        alerts_delivered.inc(len(alerts))
+        delivery_batch_size.observe(len(alerts))
+
+
+class AlertDelivery:
+    """
+    Runs one AlertDispatcher per configured sink in the background.
+    """
+
+    def __init__(self, client, sinks):
+        self.dispatchers = [AlertDispatcher(client, sink) for sink in sinks]
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(dispatcher.run()) for dispatcher in self.dispatchers]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for dispatcher in self.dispatchers:
+            await dispatcher.sink.close()
+
+
+alert_queue = AlertQueue(redis_writer)
+alert_delivery = AlertDelivery(redisClient, build_sinks())
@@ -0,0 +1,63 @@
+"""
+Recovers the 1-minute candles an instrument missed while the upstream feed
+was down, from the Upstox candle APIs.
+
+Closed days come through the historical candle cache; today comes from the
+intraday endpoint, which is the only one that covers the current session.
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from app.candle_cache import candle_cache
+from app.historical import COLUMNS, columns_from_upstox
+from app.upstox_api import fetch_intraday_candle_data
+
+IST = timezone(timedelta(hours=5, minutes=30))
+BACKFILL_MAX_DAYS = int(os.getenv("FEED_BACKFILL_MAX_DAYS", "5"))
+MINUTE_MS = 60_000
+
+
+async def fetch_missing_candles(instrument_key, after_ms, before_ms=None):
+    """
+    Returns the closed 1-minute candles with after_ms < ts_ms < before_ms.
+
+    Args:
+        instrument_key (str): Upstox instrument key
+        after_ms (int): Start of the last candle already processed
+        before_ms (int or None): Start of the first candle the live feed
+            delivered; defaults to the current, still-forming minute
+
+    Returns:
+        list: (ts_ms, open, high, low, close, volume) tuples, oldest first,
+        shaped like websocket_stream.extract_minute_candles output
+    """
+    now = datetime.now(IST)
+    current_minute_ms = int(time.time() * 1000) // MINUTE_MS * MINUTE_MS
+    before_ms = current_minute_ms if before_ms is None else min(before_ms, current_minute_ms)
+    if before_ms - after_ms <= MINUTE_MS:
+        return []
+
+    today = now.date()
+    first_day = max(
+        datetime.fromtimestamp(after_ms / 1000, IST).date(),
+        today - timedelta(days=BACKFILL_MAX_DAYS),
+    )
+
+    candle_list = []
+    if first_day < today:
+        data = await candle_cache.get_candles(
+            instrument_key, "minutes", 1, (today - timedelta(days=1)).isoformat(), first_day.isoformat(),
+        )
+        if data and "data" in data:
+            candle_list += data["data"]["candles"]
+    data = await fetch_intraday_candle_data(instrument_key, "minutes", 1)
+    if data and "data" in data:
+        candle_list += data["data"]["candles"]
+
+    columns = columns_from_upstox(candle_list)
+    ts_ms = columns["ts_ms"]
+    keep = (ts_ms > after_ms) & (ts_ms < before_ms)
+    # The two sources never overlap, but one refetched day could repeat a minute
+    keep &= np.r_[True, ts_ms[1:] != ts_ms[:-1]]
+    return list(zip(*(columns[name][keep].tolist() for name in COLUMNS)))
@@ -0,0 +1,180 @@
+"""
+Vectorized backtest of the live signal strategies over historical candles.
+
+    python -m app.backtest --file candles.csv --horizon 5
+    python -m app.backtest --instrument "NSE_EQ|INE002A01018" --unit minutes --interval 1 \\
+        --from-date 2025-01-01 --to-date 2025-01-31 --verify
+"""
+import argparse
+import asyncio
+import csv
+import json
+import numpy as np
+from app.historical import COLUMNS, columns_from_upstox, sort_columns
+from app.indicators import cvd_batch, ema_batch, rolling_cvd_batch, rsi_batch, vwap_batch
+from app.signal_engine import STRATEGIES
+from app.upstox_api import fetch_candle_data
+
+def load_candles_file(path):
+    """
+    Loads candles from .npz (one array per column), .json (an Upstox
+    historical-candle response or its candle list) or .csv (ts, open, high,
+    low, close, volume; ts as epoch ms or an ISO string).
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return sort_columns({name: data[name] for name in COLUMNS})
+
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data["data"]["candles"]
+        return columns_from_upstox(data)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row and not row[0].startswith(("ts", "time", "#"))]
+    if rows and not rows[0][0].lstrip("-").isdigit():
+        return columns_from_upstox([[row[0], *map(float, row[1:6])] for row in rows])
+    values = np.asarray([row[:6] for row in rows], dtype=float)
+    columns = {"ts_ms": values[:, 0].astype(np.int64)}
+    for i, name in enumerate(COLUMNS[1:], start=1):
+        columns[name] = values[:, i]
+    return sort_columns(columns)
+
+
+async def load_candles_upstox(instrument_key, unit, interval, to_date, from_date):
+    data = await fetch_candle_data(instrument_key, unit, interval, to_date, from_date)
+    if not data or "data" not in data:
+        raise RuntimeError(f"No candle data returned for {instrument_key}")
+    return columns_from_upstox(data["data"]["candles"])
+
+
+def cvd_engulfing_signals(columns):
+    """
+    Array form of trade_signal_logic.cvd_engulfing: +1 BUY, -1 SELL, 0 none.
+    """
+    price_open, price_close = columns["open"], columns["close"]
+    cvd_open, _, _, cvd_close = cvd_batch(price_open, price_close, columns["volume"])
+    has_prev = np.arange(len(price_close)) > 0
+    prev_cvd_close = np.r_[np.nan, cvd_close[:-1]]
+
+    buy = has_prev & (price_close > price_open) & (cvd_close > cvd_open) & (cvd_close > prev_cvd_close)
+    sell = has_prev & (price_close < price_open) & (cvd_close < cvd_open) & (cvd_close < prev_cvd_close)
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def ema_cross_vwap_signals(columns):
+    """
+    Array form of trade_signal_logic.ema_cross_vwap.
+    """
+    ts_ms, high, low, close, volume = (columns[name] for name in ("ts_ms", "high", "low", "close", "volume"))
+    ema_fast = ema_batch(close, 9)
+    ema_slow = ema_batch(close, 21)
+    vwap = vwap_batch(ts_ms, high, low, close, volume)
+    rsi = rsi_batch(close, 14)
+    rolling_cvd = rolling_cvd_batch(columns["open"], close, volume, 30)
+
+    has_prev = np.arange(len(close)) > 0
+    prev_fast = np.r_[np.nan, ema_fast[:-1]]
+    prev_slow = np.r_[np.nan, ema_slow[:-1]]
+    crossed_up = has_prev & (prev_fast <= prev_slow) & (ema_fast > ema_slow)
+    crossed_down = has_prev & (prev_fast >= prev_slow) & (ema_fast < ema_slow)
+
+    buy = crossed_up & (close > vwap) & (rolling_cvd > 0) & (rsi < 70)
+    sell = crossed_down & (close < vwap) & (rolling_cvd < 0) & (rsi > 30)
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+VECTOR_RULES = {
+    "cvd_engulfing": cvd_engulfing_signals,
+    "ema_cross_vwap": ema_cross_vwap_signals,
+}
+
+
+def live_signals(columns, strategy_name="cvd_engulfing"):
+    """
+    Replays the candles through the live per-tick StrategyState, for verification.
+    """
+    state = STRATEGIES[strategy_name].new_state()
+    codes = {"BUY": 1, "SELL": -1, None: 0}
+    candles = zip(*(columns[name].tolist() for name in COLUMNS))
+    return np.fromiter((codes[state.update(candle)[1]] for candle in candles), dtype=np.int8, count=len(columns["close"]))
+
+
+def evaluate(columns, signals, horizon=5):
+    """
+    Scores each signal by the close-to-close move `horizon` candles later.
+
+    Signals without `horizon` candles after them are reported but not scored.
+
+    Returns:
+        dict: signal counts, hit rate and P&L (price points per unit, and summed returns)
+    """
+    close = columns["close"]
+    idx = np.flatnonzero(signals)
+    direction = signals[idx].astype(float)
+    scored = idx + horizon < len(close)
+    entry = close[idx[scored]]
+    exit_ = close[idx[scored] + horizon]
+    pnl = direction[scored] * (exit_ - entry)
+    returns = direction[scored] * (exit_ / entry - 1.0)
+
+    return {
+        "candles": int(len(close)),
+        "signals": int(len(idx)),
+        "buy": int((signals == 1).sum()),
+        "sell": int((signals == -1).sum()),
+        "scored": int(scored.sum()),
+        "hit_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+        "pnl_points": float(pnl.sum()),
+        "pnl_return": float(returns.sum()),
+        "avg_return": float(returns.mean()) if len(returns) else 0.0,
+    }
+
+
+def run_backtest(columns, strategy_name="cvd_engulfing", horizon=5):
+    """
+    Returns (signals, report) for a strategy over ascending candle columns.
+    """
+    signals = VECTOR_RULES[strategy_name](columns)
+    return signals, evaluate(columns, signals, horizon)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest a signal strategy over historical candles.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="candles as .csv, .json or .npz")
+    source.add_argument("--instrument", help="Upstox instrument key to download")
+    parser.add_argument("--unit", default="minutes")
+    parser.add_argument("--interval", type=int, default=1)
+    parser.add_argument("--from-date")
+    parser.add_argument("--to-date")
+    parser.add_argument("--strategy", default="cvd_engulfing", choices=sorted(VECTOR_RULES))
+    parser.add_argument("--horizon", type=int, default=5, help="candles to hold each signal")
+    parser.add_argument("--verify", action="store_true", help="also replay through the live logic and compare")
+    parser.add_argument("--show-signals", action="store_true")
+    args = parser.parse_args()
+
+    if args.file:
+        columns = load_candles_file(args.file)
+    else:
+        columns = asyncio.run(load_candles_upstox(args.instrument, args.unit, args.interval, args.to_date, args.from_date))
+
+    signals, report = run_backtest(columns, args.strategy, args.horizon)
+    print(json.dumps(report, indent=2))
+
+    if args.show_signals:
+        for i in np.flatnonzero(signals):
+            print(int(columns["ts_ms"][i]), "BUY" if signals[i] > 0 else "SELL", columns["close"][i])
+
+    if args.verify:
+        live = live_signals(columns, args.strategy)
+        mismatches = np.flatnonzero(live != signals)
+        print(f"live logic agreement: {len(signals) - len(mismatches)}/{len(signals)} candles")
+        if len(mismatches):
+            raise SystemExit(f"first mismatch at ts_ms={int(columns['ts_ms'][mismatches[0]])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from redis.exceptions import RedisError
+from app import metrics
+from app.historical import parse_candle_times
+from app.logging import log_warning
+from app.redis import redisClient
+from app.upstox_api import fetch_candle_data
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Weekly/monthly candles are stamped outside the requested days, so they bypass the cache
+CACHEABLE_UNITS = {"minutes", "hours", "days"}
+CURRENT_DAY_TTL = int(os.getenv("CANDLE_CACHE_TODAY_TTL", "60"))
+DAY_SECONDS = 86400
+
+cache_hit_days = metrics.counter("candle_cache_hit_days_total", "Requested days served from the candle cache")
+cache_miss_days = metrics.counter("candle_cache_miss_days_total", "Requested days fetched from Upstox")
+cache_full_hits = metrics.counter("candle_cache_full_hits_total", "Requests served without calling Upstox")
+cache_fetches = metrics.counter("candle_cache_upstream_fetches_total", "Upstox range fetches issued to fill gaps")
+
+
+def day_range(from_day, to_day):
+    return [from_day + timedelta(days=i) for i in range((to_day - from_day).days + 1)]
+
+
+def missing_ranges(days):
+    """
+    Groups sorted dates into (first, last) runs of consecutive days.
+    """
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(r) for r in ranges]
+
+
+def day_score(day):
+    """
+    Score of a day's first candle; candles are scored by their IST wall clock read as UTC.
+    """
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+class CandleCache:
+    """
+    Read-through cache of Upstox historical candles per (instrument, unit, interval).
+
+    Candles live in a ZSET scored by time. A SET records which closed days are
+    fully cached; those never expire. Days from today onward are only trusted
+    for CURRENT_DAY_TTL seconds. A request fetches just the runs of days that
+    are missing and serves the rest from Redis.
+    """
+
+    def __init__(self, client, today_ttl=CURRENT_DAY_TTL):
+        self.client = client
+        self.today_ttl = today_ttl
+
+    async def get_candles(self, instrument_key, unit, interval, to_date, from_date):
+        """
+        Same contract as upstox_api.fetch_candle_data, newest candle first.
+        Like Upstox, it gives None for dates that are not YYYY-MM-DD or a
+        from_date after to_date. Without Redis the whole range comes straight
+        from Upstox.
+        """
+        if unit not in CACHEABLE_UNITS:
+            return await fetch_candle_data(instrument_key, unit, interval, to_date, from_date)
+
+        try:
+            days = day_range(date.fromisoformat(from_date), date.fromisoformat(to_date))
+        except ValueError:
+            days = []
+        if not days:
+            log_warning("Invalid candle date range %s to %s", from_date, to_date)
+            return None
+
+        try:
+            return await self._get_cached(instrument_key, unit, interval, days)
+        except RedisError as e:
+            log_warning("Candle cache unavailable, fetching from Upstox: %s", e)
+            return await fetch_candle_data(instrument_key, unit, interval, to_date, from_date)
+
+    async def _get_cached(self, instrument_key, unit, interval, days):
+        base = f"hist:{instrument_key}:{unit}:{interval}"
+        today = datetime.now(IST).date()
+        closed = [day for day in days if day < today]
+        current = [day for day in days if day >= today]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            if closed:
+                pipe.smismember(f"{base}:days", [day.isoformat() for day in closed])
+            for day in current:
+                pipe.exists(f"{base}:fresh:{day.isoformat()}")
+            results = await pipe.execute()
+
+        cached = list(results.pop(0)) if closed else []
+        cached += results
+        missing = [day for day, hit in zip(closed + current, cached) if not hit]
+
+        cache_hit_days.inc(len(days) - len(missing))
+        cache_miss_days.inc(len(missing))
+        if not missing:
+            cache_full_hits.inc()
+
+        for first, last in missing_ranges(missing):
+            cache_fetches.inc()
+            data = await fetch_candle_data(instrument_key, unit, interval, last.isoformat(), first.isoformat())
+            if not data or "data" not in data:
+                return None
+            await self._store(base, first, last, data["data"]["candles"], today)
+
+        members = await self.client.zrevrangebyscore(f"{base}:candles", day_score(days[-1]) + DAY_SECONDS - 1, day_score(days[0]))
+        return {"status": "success", "data": {"candles": [json.loads(member) for member in members]}}
+
+    async def _store(self, base, first, last, candles, today):
+        scores = parse_candle_times([candle[0] for candle in candles]).astype("int64").tolist() if candles else []
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(f"{base}:candles", day_score(first), day_score(last) + DAY_SECONDS - 1)
+            if candles:
+                pipe.zadd(f"{base}:candles", {json.dumps(candle): score for candle, score in zip(candles, scores)})
+            for day in day_range(first, last):
+                if day < today:
+                    pipe.sadd(f"{base}:days", day.isoformat())
+                else:
+                    pipe.set(f"{base}:fresh:{day.isoformat()}", 1, ex=self.today_ttl)
+            await pipe.execute()
+
+
+candle_cache = CandleCache(redisClient)
@@ -0,0 +1,196 @@
+import json
+import os
+import struct
+from app.redis import redisClient
+from app.redis_writer import redis_writer
+from app.resample import BASE_TIMEFRAME
+
+# ts, price OHLC, CVD OHLC
+CANDLE_FORMAT = struct.Struct("<q8d")
+
+DEFAULT_MAX_CANDLES = int(os.getenv("CANDLE_RETENTION_COUNT", "20000"))
+DEFAULT_MAX_AGE = int(os.getenv("CANDLE_RETENTION_SECONDS", str(30 * 24 * 3600)))
+# Per-instrument overrides as JSON, e.g. {"NSE_EQ|INE002A01018": {"max_candles": 100000, "max_age": 0}}
+CANDLE_RETENTION = os.getenv("CANDLE_RETENTION", "")
+
+# Replace whatever is stored at this timestamp, then trim by count and age.
+UPSERT_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[1])
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+local max_count = tonumber(ARGV[3])
+if max_count > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -max_count - 1)
+end
+local max_age = tonumber(ARGV[4])
+if max_age > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. (tonumber(ARGV[1]) - max_age))
+end
+"""
+
+upsert_script = redisClient.register_script(UPSERT_LUA)
+
+
+def series_key(instrument_key, kind, timeframe=BASE_TIMEFRAME):
+    """
+    Redis key of an instrument's "candles" or "signals" set for a timeframe.
+    """
+    if timeframe == BASE_TIMEFRAME:
+        return f"{instrument_key}:{kind}"
+    return f"{instrument_key}:{kind}:{timeframe}"
+
+
+def parse_retention(text):
+    """
+    Parses CANDLE_RETENTION into set_retention arguments.
+
+    Returns:
+        dict: instrument_key -> {"max_candles": int, "max_age": int}, either may be absent
+
+    Raises:
+        ValueError: If the text is not such a JSON object
+    """
+    if not text.strip():
+        return {}
+    try:
+        config = json.loads(text)
+    except ValueError:
+        raise ValueError("CANDLE_RETENTION must be JSON")
+    if not isinstance(config, dict):
+        raise ValueError("CANDLE_RETENTION must map instrument keys to limits")
+    retention = {}
+    for instrument_key, limits in config.items():
+        if not isinstance(limits, dict) or not set(limits) <= {"max_candles", "max_age"}:
+            raise ValueError(f"CANDLE_RETENTION for {instrument_key} must only set max_candles and max_age")
+        if not all(isinstance(value, int) and value >= 0 for value in limits.values()):
+            raise ValueError(f"CANDLE_RETENTION limits for {instrument_key} must be non-negative integers")
+        retention[instrument_key] = limits
+    return retention
+
+
+def pack_candle(payload):
+    """
+    Packs a client payload into the fixed 72-byte ZSET member.
+    """
+    price = payload["price"]
+    volume = payload["volume"]
+    return CANDLE_FORMAT.pack(
+        payload["time"],
+        price["open"], price["high"], price["low"], price["close"],
+        volume["open"], volume["high"], volume["low"], volume["close"],
+    )
+
+
+def unpack_candle(member):
+    """
+    Inverse of pack_candle, returning the client payload shape (without alert).
+    """
+    ts, p_open, p_high, p_low, p_close, v_open, v_high, v_low, v_close = CANDLE_FORMAT.unpack(member)
+    return {
+        "time": ts,
+        "price": {"time": ts, "open": p_open, "high": p_high, "low": p_low, "close": p_close},
+        "volume": {"time": ts, "open": v_open, "high": v_high, "low": v_low, "close": v_close},
+    }
+
+
+class CandleStore:
+    """
+    Per-instrument candle and alert series in Redis sorted sets scored by timestamp.
+
+    `{instrument}:candles` holds packed candles and `{instrument}:signals` holds
+    alert JSON. Each timestamp has at most one member, so repeated writes of
+    the same minute replace the stored candle instead of appending.
+    Resampled timeframes live in `{instrument}:candles:{timeframe}` and
+    `{instrument}:signals:{timeframe}`.
+
+    Args:
+        retention (dict or None): instrument_key -> set_retention keyword
+            arguments, see parse_retention
+    """
+
+    def __init__(self, client, writer, max_candles=DEFAULT_MAX_CANDLES, max_age=DEFAULT_MAX_AGE, retention=None):
+        self.client = client
+        self.writer = writer
+        self.default_retention = (max_candles, max_age)
+        self.retention = {}
+        for instrument_key, limits in (retention or {}).items():
+            self.set_retention(instrument_key, **limits)
+
+    def set_retention(self, instrument_key, max_candles=None, max_age=None):
+        """
+        Overrides retention for one instrument. 0 disables that limit.
+        """
+        default_count, default_age = self.default_retention
+        self.retention[instrument_key] = (
+            default_count if max_candles is None else max_candles,
+            default_age if max_age is None else max_age,
+        )
+
+    def upsert(self, instrument_key, payload, timeframe=BASE_TIMEFRAME):
+        """
+        Queues an idempotent write of a candle payload and its alert, if any.
+        """
+        ts_sec = payload["time"]
+        max_count, max_age = self.retention.get(instrument_key, self.default_retention)
+
+        candle_key = series_key(instrument_key, "candles", timeframe)
+        candle_args = [ts_sec, pack_candle(payload), max_count, max_age]
+        self.writer.enqueue(lambda pipe: upsert_script(keys=[candle_key], args=candle_args, client=pipe))
+
+        alert = payload.get("alert")
+        if alert:
+            self.upsert_alert(instrument_key, ts_sec, alert, timeframe)
+
+    def upsert_alert(self, instrument_key, ts_sec, alert, timeframe=BASE_TIMEFRAME):
+        max_count, max_age = self.retention.get(instrument_key, self.default_retention)
+        signal_key = series_key(instrument_key, "signals", timeframe)
+        signal_args = [ts_sec, json.dumps({"time": ts_sec, **alert}), max_count, max_age]
+        self.writer.enqueue(lambda pipe: upsert_script(keys=[signal_key], args=signal_args, client=pipe))
+
+    async def get_range(self, instrument_key, from_ts=None, to_ts=None, limit=None, timeframe=BASE_TIMEFRAME):
+        """
+        Returns candles with from_ts <= time <= to_ts in ascending time order.
+
+        When limit is given, the most recent `limit` candles of the window are returned.
+        """
+        members = await self._range(series_key(instrument_key, "candles", timeframe), from_ts, to_ts, limit)
+        return [unpack_candle(member) for member in members]
+
+    async def get_many(self, instrument_keys, from_ts=None, to_ts=None, limit=None, timeframe=BASE_TIMEFRAME):
+        """
+        get_range for several instruments in one round trip.
+
+        Returns:
+            dict: instrument_key -> candles
+        """
+        low = "-inf" if from_ts is None else from_ts
+        high = "+inf" if to_ts is None else to_ts
+        pipe = self.client.pipeline(transaction=False)
+        for instrument_key in instrument_keys:
+            key = series_key(instrument_key, "candles", timeframe)
+            if limit is None:
+                pipe.zrangebyscore(key, low, high)
+            else:
+                pipe.zrevrangebyscore(key, high, low, start=0, num=limit)
+        results = await pipe.execute()
+        if limit is not None:
+            results = [members[::-1] for members in results]
+        return {
+            instrument_key: [unpack_candle(member) for member in members]
+            for instrument_key, members in zip(instrument_keys, results)
+        }
+
+    async def get_alerts(self, instrument_key, from_ts=None, to_ts=None, limit=None, timeframe=BASE_TIMEFRAME):
+        members = await self._range(series_key(instrument_key, "signals", timeframe), from_ts, to_ts, limit)
+        return [json.loads(member) for member in members]
+
+    async def _range(self, key, from_ts, to_ts, limit):
+        low = "-inf" if from_ts is None else from_ts
+        high = "+inf" if to_ts is None else to_ts
+        if limit is None:
+            return await self.client.zrangebyscore(key, low, high)
+        members = await self.client.zrevrangebyscore(key, high, low, start=0, num=limit)
+        members.reverse()
+        return members
+
+
+candle_store = CandleStore(redisClient, redis_writer, retention=parse_retention(CANDLE_RETENTION))
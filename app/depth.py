@@ -0,0 +1,188 @@
+"""
+Order-book and tick aggregation from full-mode market feeds.
+
+Each instrument keeps a fixed set of NumPy arrays, sized once:
+
+- book: the latest DEPTH_LEVELS bid/ask levels (price and quantity)
+- stats: the latest LTPC and ExtendedFeedDetails scalars (STAT_FIELDS)
+- history: a ring of the last DEPTH_HISTORY frames as (ts_ms, ltp, book
+  imbalance, tick CVD)
+
+so memory per instrument is constant however long the feed runs.
+
+Tick CVD is built from LTPC trades instead of the candle-direction
+approximation of compute_cvd_ohlc: the volume traded since the previous
+frame (the vtt delta, or ltq for a new trade when vtt is absent) is signed
+by the quote rule against the book as it stood before the trade (at or
+above the ask is a buy, at or below the bid a sell) and by the tick rule
+inside the spread.
+
+Between two processed candles the aggregator also accumulates a window,
+which process_minute_candle hands to the signal logic as extra values:
+"book_imbalance" (mean top-of-book imbalance over the window, in [-1, 1])
+and "tick_cvd" (open, high, low, close of tick CVD over the window).
+"""
+import math
+import os
+import numpy as np
+
+# Costs roughly 20 us per instrument per frame, so it only runs for
+# strategies with needs_depth unless forced on with DEPTH_ENABLED=1
+DEPTH_ENABLED = os.getenv("DEPTH_ENABLED", "0") == "1"
+DEPTH_LEVELS = int(os.getenv("DEPTH_LEVELS", "5"))
+DEPTH_HISTORY = int(os.getenv("DEPTH_HISTORY", "1024"))
+
+BOOK_FIELDS = ("bid_price", "bid_qty", "ask_price", "ask_qty")
+STAT_FIELDS = ("ltp", "ltt", "ltq", "atp", "vtt", "tbq", "tsq", "lut")
+HISTORY_FIELDS = ("ts_ms", "ltp", "imbalance", "tick_cvd")
+
+BID_PRICE, BID_QTY, ASK_PRICE, ASK_QTY = range(4)
+LTP, LTT, LTQ, ATP, VTT, TBQ, TSQ, LUT = range(len(STAT_FIELDS))
+
+
+class InstrumentDepth:
+    """
+    Latest book, trade statistics and a bounded tick history for one instrument.
+    """
+    __slots__ = (
+        "book", "stats", "history", "_next", "_filled",
+        "side", "cum_delta", "_seen_vtt",
+        "_window_open", "_window_high", "_window_low", "_window_imbalance", "_window_frames",
+    )
+
+    def __init__(self, levels=DEPTH_LEVELS, history=DEPTH_HISTORY):
+        self.book = np.zeros((levels, len(BOOK_FIELDS)))
+        self.stats = np.zeros(len(STAT_FIELDS))
+        self.history = np.full((history, len(HISTORY_FIELDS)), np.nan)
+        self._next = 0
+        self._filled = 0
+        self.side = 0
+        self.cum_delta = 0.0
+        self._seen_vtt = False
+        self._reset_window()
+
+    def update(self, market_ff, ts_ms):
+        """
+        Applies one MarketFullFeed message received at ts_ms.
+        """
+        book = self.book
+        stats = self.stats
+        best_bid, _, best_ask, _ = book[0].tolist()
+        prev_ltp, prev_ltt, _, _, prev_vtt, _, _, _ = stats.tolist()
+
+        # Book levels; imbalance is summed over the levels received
+        levels = market_ff.marketLevel.bidAskQuote
+        if len(levels) > len(book):
+            levels = levels[:len(book)]
+        rows = [(quote.bp, quote.bidQ, quote.ap, quote.askQ) for quote in levels]
+        if rows:
+            book[:len(rows)] = rows
+            if len(rows) < len(book):
+                book[len(rows):] = 0.0
+            bid_qty = sum(row[1] for row in rows)
+            ask_qty = sum(row[3] for row in rows)
+            total = bid_qty + ask_qty
+            imbalance = (bid_qty - ask_qty) / total if total else 0.0
+        else:
+            imbalance = math.nan
+
+        ltpc = market_ff.ltpc
+        details = market_ff.eFeedDetails
+        ltp = ltpc.ltp
+        stats[:] = (ltp, ltpc.ltt, ltpc.ltq, details.atp, details.vtt, details.tbq, details.tsq, market_ff.marketLevel.lut)
+
+        # Volume traded since the previous frame
+        vtt = details.vtt
+        if vtt and self._seen_vtt and vtt >= prev_vtt:
+            volume = vtt - prev_vtt
+        elif ltpc.ltt != prev_ltt:
+            # First frame, a session reset, or a feed without vtt: count the last trade only
+            volume = ltpc.ltq
+        else:
+            volume = 0
+        self._seen_vtt = self._seen_vtt or bool(vtt)
+
+        if volume and ltp:
+            if best_ask and ltp >= best_ask:
+                self.side = 1
+            elif best_bid and ltp <= best_bid:
+                self.side = -1
+            elif prev_ltp and ltp != prev_ltp:
+                self.side = 1 if ltp > prev_ltp else -1
+            # A zero tick inside the spread keeps the previous side
+            self.cum_delta += self.side * volume
+
+        cum_delta = self.cum_delta
+        self.history[self._next] = (ts_ms, ltp, imbalance, cum_delta)
+        self._next = (self._next + 1) % len(self.history)
+        self._filled = min(self._filled + 1, len(self.history))
+
+        if cum_delta > self._window_high:
+            self._window_high = cum_delta
+        if cum_delta < self._window_low:
+            self._window_low = cum_delta
+        if imbalance == imbalance:
+            self._window_imbalance += imbalance
+            self._window_frames += 1
+
+    def imbalance(self):
+        """
+        Current top-of-book imbalance over all stored levels, in [-1, 1].
+        """
+        bid_qty = self.book[:, BID_QTY].sum()
+        ask_qty = self.book[:, ASK_QTY].sum()
+        total = bid_qty + ask_qty
+        return float((bid_qty - ask_qty) / total) if total else 0.0
+
+    def series(self, count=None):
+        """
+        The most recent `count` history rows (all by default), oldest first,
+        as a dict of HISTORY_FIELDS columns.
+        """
+        filled = self._filled if count is None else min(count, self._filled)
+        index = (self._next - filled + np.arange(filled)) % len(self.history)
+        rows = self.history[index]
+        return {name: rows[:, i] for i, name in enumerate(HISTORY_FIELDS)}
+
+    def take_window(self):
+        """
+        Returns and restarts the aggregates since the previous call.
+
+        Returns:
+            dict: {"book_imbalance": float (NaN without book updates),
+                   "tick_cvd": (open, high, low, close)}
+        """
+        frames = self._window_frames
+        features = {
+            "book_imbalance": self._window_imbalance / frames if frames else math.nan,
+            "tick_cvd": (self._window_open, self._window_high, self._window_low, self.cum_delta),
+        }
+        self._reset_window()
+        return features
+
+    def _reset_window(self):
+        self._window_open = self._window_high = self._window_low = self.cum_delta
+        self._window_imbalance = 0.0
+        self._window_frames = 0
+
+
+def update_depth(feed_response, states):
+    """
+    Feeds every watched instrument's full-mode market data in a decoded
+    FeedResponse to its InstrumentDepth.
+
+    Args:
+        feed_response (FeedResponse): The decoded upstream frame
+        states (dict): instrument_key -> InstrumentState
+    """
+    ts_ms = feed_response.currentTs
+    for instrument_key, feed in feed_response.feeds.items():
+        state = states.get(instrument_key)
+        if state is None or state.depth is None:
+            continue
+        if not feed.HasField("ff"):
+            continue
+        full_feed = feed.ff
+        if not full_feed.HasField("marketFF"):
+            continue
+        state.depth.update(full_feed.marketFF, ts_ms)
@@ -0,0 +1,181 @@
+"""
+Redis pub/sub distribution of processed candles between processes.
+
+With FEED_MODE=redis, web workers do not connect to Upstox. An ingestion
+worker (python -m app.ingest) holds the single upstream connection and
+publishes every processed candle, alert included, as the JSON wire payload
+on the "{instrument}:updates" channel. Web workers subscribe to the channels
+of the instruments their clients watch and fan out locally.
+
+Demand flows the other way: each web worker keeps the instruments it needs
+in a "feed:demand:{worker}" SET with a TTL it refreshes, and announces
+changes on the "feed:demand" channel. The ingestion worker follows the union
+of those sets, so a crashed web worker's instruments are dropped once its
+key expires.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from redis.exceptions import RedisError
+from app import metrics
+from app.logging import log_error, log_warning
+from app.wire import Update
+
+FEED_MODE_LOCAL = "local"
+FEED_MODE_REDIS = "redis"
+FEED_MODES = (FEED_MODE_LOCAL, FEED_MODE_REDIS)
+FEED_MODE = os.getenv("FEED_MODE", FEED_MODE_LOCAL)
+
+DEMAND_TTL = int(os.getenv("FEED_DEMAND_TTL", "30"))
+DEMAND_CHANNEL = "feed:demand"
+DEMAND_KEY_PREFIX = "feed:demand:"
+UPDATES_SUFFIX = ":updates"
+
+updates_received = metrics.counter("feed_updates_received_total", "Updates received from the ingestion worker")
+resubscribes = metrics.counter("feed_redis_resubscribes_total", "Pub/sub connections re-established after a Redis error")
+
+
+def updates_channel(instrument_key):
+    return f"{instrument_key}{UPDATES_SUFFIX}"
+
+
+def publish_update(writer, update):
+    """
+    Queues a PUBLISH of an update through the batched writer, so it leaves in
+    the same pipeline as (and after) the candle write it belongs to.
+    """
+    channel = updates_channel(update.instrument_key)
+    text = update.json()
+    writer.enqueue(lambda pipe: pipe.publish(channel, text))
+
+
+async def demanded_instruments(client):
+    """
+    Union of the instruments every live web worker currently needs.
+    """
+    keys = [key async for key in client.scan_iter(match=DEMAND_KEY_PREFIX + "*", count=100)]
+    if not keys:
+        return set()
+    return {member.decode() for member in await client.sunion(keys)}
+
+
+class RedisFeedSource:
+    """
+    Web-worker side of the distribution: a FeedManager source that receives
+    processed updates from the ingestion worker instead of from Upstox.
+
+    Args:
+        client (redis.asyncio.Redis): Connection pool owner
+        on_update (callable): Called with every received wire.Update
+    """
+
+    def __init__(self, client, on_update):
+        self.client = client
+        self.on_update = on_update
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.demand_key = DEMAND_KEY_PREFIX + self.worker_id
+        self.instruments = set()
+        self._pubsub = None
+        self._task = None
+        # The pub/sub connection is opened lazily by the first (un)subscribe;
+        # concurrent clients must not race to open it
+        self._lock = asyncio.Lock()
+
+    async def watch(self, instrument_keys):
+        async with self._lock:
+            added = [key for key in instrument_keys if key not in self.instruments]
+            if not added:
+                return
+            self.instruments.update(added)
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self.client.pubsub()
+                await self._pubsub.subscribe(*map(updates_channel, added))
+                await self._announce()
+            except BaseException:
+                # Let the next watch of these instruments try again
+                self.instruments.difference_update(added)
+                raise
+
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+
+    async def unwatch(self, instrument_keys):
+        async with self._lock:
+            removed = [key for key in instrument_keys if key in self.instruments]
+            if not removed:
+                return
+            self.instruments.difference_update(removed)
+            if self._pubsub is not None:
+                await self._pubsub.unsubscribe(*map(updates_channel, removed))
+            await self._announce()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self.instruments.clear()
+        try:
+            await self._announce()
+        except RedisError as e:
+            log_warning("Could not withdraw feed demand: %s", e)
+
+    async def _announce(self):
+        """
+        Replaces this worker's demand set and tells the ingestion worker.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.demand_key)
+        if self.instruments:
+            pipe.sadd(self.demand_key, *self.instruments)
+            pipe.expire(self.demand_key, DEMAND_TTL)
+        pipe.publish(DEMAND_CHANNEL, self.worker_id)
+        await pipe.execute()
+
+    async def _run(self):
+        refresh_every = DEMAND_TTL / 3
+        next_refresh = time.monotonic() + refresh_every
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(1.0)
+                    message = None
+                else:
+                    message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None and message["type"] == "message":
+                    updates_received.inc()
+                    channel = message["channel"].decode()
+                    instrument_key = channel[:-len(UPDATES_SUFFIX)]
+                    try:
+                        self.on_update(Update.from_json(instrument_key, message["data"].decode()))
+                    except Exception as e:
+                        log_error("Error in processing update: %s", e, exc_info=True)
+
+                if time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + refresh_every
+                    if self.instruments:
+                        await self.client.expire(self.demand_key, DEMAND_TTL)
+            except RedisError as e:
+                log_warning("Lost Redis pub/sub connection, resubscribing: %s", e)
+                await asyncio.sleep(1)
+                await self._resubscribe()
+
+    async def _resubscribe(self):
+        async with self._lock:
+            await self._reopen()
+
+    async def _reopen(self):
+        try:
+            await self._pubsub.aclose()
+            self._pubsub = self.client.pubsub()
+            if self.instruments:
+                await self._pubsub.subscribe(*map(updates_channel, self.instruments))
+            await self._announce()
+            resubscribes.inc()
+        except RedisError as e:
+            log_error("Resubscribe failed: %s", e)
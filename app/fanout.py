@@ -0,0 +1,127 @@
+import asyncio
+import itertools
+import os
+import time
+from collections import OrderedDict
+from app import metrics
+
+CLIENT_QUEUE_SIZE = int(os.getenv("CLIENT_QUEUE_SIZE", "256"))
+CLIENT_QUEUE_POLICY = os.getenv("CLIENT_QUEUE_POLICY", "drop_oldest")
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+dropped_total = metrics.counter("fanout_dropped_total", "Updates dropped from full client queues")
+coalesced_total = metrics.counter("fanout_coalesced_total", "Updates merged into a pending update for the same candle")
+disconnects_total = metrics.counter("fanout_slow_disconnects_total", "Clients disconnected for falling behind")
+
+_client_ids = itertools.count(1)
+
+
+class ClientChannel:
+    """
+    Bounded send queue between the ingestion loop and one client websocket.
+
+    push() never blocks. When the queue is full the policy decides what gives:
+
+    - drop_oldest: discard the oldest pending update
+    - coalesce: replace a pending update for the same candle in place, and
+      otherwise fall back to dropping the oldest
+    - disconnect: mark the channel overflowed so the sender closes the socket
+
+    Args:
+        maxsize (int): Pending updates kept before the policy applies
+        policy (str): One of POLICIES
+        label (str): Free-form description shown in client stats
+    """
+
+    def __init__(self, maxsize=CLIENT_QUEUE_SIZE, policy=CLIENT_QUEUE_POLICY, label=""):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown client queue policy {policy!r}, expected one of {POLICIES}")
+        self.id = next(_client_ids)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.label = label
+        self.overflowed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # key -> (enqueued_at, update), oldest first
+        self._pending = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+
+    def push(self, update):
+        """
+        Queues a wire.Update. Under the coalesce policy, updates with the same
+        update.key (instrument, timeframe, candle time) replace each other while pending.
+        """
+        if self.overflowed:
+            return
+        if self.policy == COALESCE:
+            key = update.key
+            if key in self._pending:
+                enqueued_at, _ = self._pending[key]
+                self._pending[key] = (enqueued_at, update)
+                self.coalesced += 1
+                coalesced_total.inc()
+                return
+        else:
+            key = next(self._seq)
+
+        if len(self._pending) >= self.maxsize:
+            if self.policy == DISCONNECT:
+                self.overflowed = True
+                disconnects_total.inc()
+                self._ready.set()
+                return
+            self._pending.popitem(last=False)
+            self.dropped += 1
+            dropped_total.inc()
+
+        self._pending[key] = (time.monotonic(), update)
+        self._ready.set()
+
+    async def get_batch(self, max_items=1):
+        """
+        Waits for pending updates and removes up to max_items of them, oldest first.
+
+        Returns:
+            list or None: The updates, or None once the channel has overflowed
+            under the disconnect policy
+        """
+        while not self._pending and not self.overflowed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.overflowed:
+            return None
+        batch = []
+        while self._pending and len(batch) < max_items:
+            _, (_, update) = self._pending.popitem(last=False)
+            batch.append(update)
+        self.sent += len(batch)
+        return batch
+
+    def __len__(self):
+        return len(self._pending)
+
+    def lag_seconds(self):
+        if not self._pending:
+            return 0.0
+        enqueued_at, _ = next(iter(self._pending.values()))
+        return time.monotonic() - enqueued_at
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "label": self.label,
+            "policy": self.policy,
+            "depth": len(self._pending),
+            "lag_seconds": self.lag_seconds(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "overflowed": self.overflowed,
+        }
@@ -0,0 +1,501 @@
+import asyncio
+import os
+import random
+import time
+from functools import partial
+import httpx
+from redis.exceptions import RedisError
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, WebSocketException
+from app import metrics
+from app.alerts import alert_queue
+from app.backfill import fetch_missing_candles
+from app.candle_store import candle_store
+from app.depth import update_depth
+from app.distribution import FEED_MODE, FEED_MODE_REDIS, FEED_MODES, RedisFeedSource
+from app.fanout import CLIENT_QUEUE_POLICY, CLIENT_QUEUE_SIZE, ClientChannel
+from app.feed_recorder import open_recorder
+from app.logging import log_error, log_info, log_warning
+from app.redis import redisClient
+from app.resample import BASE_TIMEFRAME, bucket_start
+from app.wire import Update
+from app.websocket_stream import (
+    InstrumentState,
+    build_subscription,
+    connect_market_feed,
+    decode_protobuf,
+    extract_minute_candles,
+    get_authorized_feed_uri,
+    invalidate_authorized_feed_uri,
+    process_minute_candle,
+)
+
+frames_received = metrics.counter("feed_frames_total", "Upstream frames received")
+candles_processed = metrics.counter("feed_candles_total", "New minute candles processed")
+decode_seconds = metrics.histogram("feed_decode_seconds", "Protobuf decode and candle extraction per frame")
+compute_seconds = metrics.histogram("feed_compute_seconds", "Indicator/signal compute per frame")
+depth_seconds = metrics.histogram("feed_depth_seconds", "Order-book and tick aggregation per frame")
+store_seconds = metrics.histogram("feed_store_seconds", "Queueing candle writes per frame")
+fanout_seconds = metrics.histogram("feed_fanout_seconds", "Fan-out to client queues (or publishing) per frame")
+reconnects = metrics.counter("feed_reconnects_total", "Upstream reconnect attempts after a lost or failed connection")
+backfilled_candles = metrics.counter("feed_backfilled_candles_total", "Missed minute candles recovered after a reconnect")
+backfill_seconds = metrics.histogram("feed_backfill_seconds", "Fetching and replaying one instrument's gap after a reconnect")
+
+RECONNECT_BASE_DELAY = float(os.getenv("FEED_RECONNECT_BASE_DELAY", "1"))
+RECONNECT_MAX_DELAY = float(os.getenv("FEED_RECONNECT_MAX_DELAY", "60"))
+BACKFILL_CONCURRENCY = int(os.getenv("FEED_BACKFILL_CONCURRENCY", "4"))
+
+
+class UpstreamFeed:
+    """
+    The Upstox market-data connection and the processing behind it.
+
+    Instruments are subscribed upstream while watched. Each candle is decoded,
+    run through the signal logic and written to Redis once, its alert queued
+    for delivery, then handed to on_update as a wire.Update, followed by one
+    Update per higher timeframe it changed.
+
+    The connection is opened with the first watched instrument and dropped
+    with the last. In between it is supervised: a lost or refused connection
+    is retried with jittered exponential backoff (re-authorizing only when
+    the cached feed URI is rejected or expired), every watched instrument is
+    resubscribed, and the minutes missed while down are backfilled from the
+    candle APIs before live candles resume, so stored series and CVD state
+    stay continuous.
+
+    Args:
+        on_update (callable): Called with every processed Update; must not block
+    """
+
+    def __init__(self, on_update):
+        self.on_update = on_update
+        self.states = {}
+        self._upstream = None
+        self._task = None
+        self._backfill_task = None
+        self._connected_before = False
+        self._recorder = open_recorder()
+
+    async def watch(self, instrument_keys):
+        added = {key: InstrumentState() for key in instrument_keys if key not in self.states}
+        self.states.update(added)
+        if added:
+            await self._seed(list(added))
+        # Keys unwatched while seeding must not be subscribed upstream
+        added = [key for key, state in added.items() if self.states.get(key) is state]
+        if added and self._upstream is not None:
+            await self._send("sub", added)
+
+        if self.states and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def unwatch(self, instrument_keys):
+        removed = [key for key in instrument_keys if self.states.pop(key, None) is not None]
+        if not removed:
+            return
+        if not self.states:
+            await self.close()
+        elif self._upstream is not None:
+            await self._send("unsub", removed)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+            self._backfill_task = None
+        self._upstream = None
+        self._connected_before = False
+        if self._recorder is not None:
+            self._recorder.flush()
+
+    async def _send(self, method, instrument_keys):
+        try:
+            await self._upstream.send(build_subscription(method, instrument_keys))
+        except ConnectionClosed as e:
+            log_warning("Upstream closed while sending %s: %s", method, e)
+
+    async def _run(self):
+        attempt = 0
+        while self.states:
+            try:
+                uri = await get_authorized_feed_uri()
+            except (httpx.HTTPError, ValueError) as e:
+                log_warning("Feed authorization failed: %s", e)
+                uri = None
+            except Exception as e:
+                log_error("Unexpected error authorizing the feed: %s", e, exc_info=True)
+                uri = None
+
+            if uri is not None:
+                try:
+                    async with connect_market_feed(uri) as websocket:
+                        await asyncio.sleep(1)
+                        self._upstream = websocket
+                        attempt = 0
+                        await websocket.send(build_subscription("sub", self.states))
+                        if self._connected_before:
+                            self._start_backfill()
+                        self._connected_before = True
+
+                        while True:
+                            msg = await websocket.recv()
+                            frames_received.inc()
+                            if self._recorder is not None:
+                                self._recorder.write(msg)
+                            try:
+                                self._handle_frame(msg)
+                            except Exception as e:
+                                log_error("Error in processing message: %s", e, exc_info=True)
+                except InvalidHandshake as e:
+                    # The cached authorization was rejected; fetch a fresh one next time
+                    invalidate_authorized_feed_uri()
+                    log_warning("Upstream feed rejected connection: %s", e)
+                except ConnectionClosed as e:
+                    log_warning("Upstream feed closed: %s", e)
+                except WebSocketException as e:
+                    log_warning("Upstream feed protocol error: %s", e)
+                except (OSError, asyncio.TimeoutError) as e:
+                    log_warning("Upstream feed connection failed: %s", e)
+                except Exception as e:
+                    # Anything else must not end the supervisor; only cancellation does
+                    log_error("Unexpected upstream feed error: %s", e, exc_info=True)
+                finally:
+                    self._upstream = None
+
+            if not self.states:
+                break
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            reconnects.inc()
+            log_info("Reconnecting to upstream feed in %.1fs", delay)
+            await asyncio.sleep(delay)
+
+    async def _seed(self, instrument_keys):
+        """
+        Restores the open higher-timeframe buckets from the stored minutes, so
+        a restart does not overwrite them with candles built from its own
+        minutes only.
+        """
+        seconds = [resampler.seconds for resampler in self.states[instrument_keys[0]].resamplers]
+        if not seconds:
+            return
+        from_ts = bucket_start(int(time.time()), max(seconds))
+        try:
+            stored = await candle_store.get_many(instrument_keys, from_ts=from_ts)
+        except RedisError as e:
+            log_warning("Could not load open candles of %d instruments: %s", len(instrument_keys), e)
+            return
+        for instrument_key, minutes in stored.items():
+            state = self.states.get(instrument_key)
+            if state is None:
+                continue
+            for resampler in state.resamplers:
+                resampler.seed(minutes)
+
+    def _start_backfill(self):
+        """
+        Backfills every watched instrument after a reconnect.
+
+        Live candles are parked from this call on, before any frame of the new
+        connection is handled, and each gap starts at the candle processed
+        last. A backfill still running from an earlier reconnect is cancelled
+        and its parked candles dropped: they fall inside the new gap, which is
+        refetched whole.
+        """
+        previous = self._backfill_task
+        if previous is not None and not previous.done():
+            previous.cancel()
+        gaps = []
+        for instrument_key, state in self.states.items():
+            if state.last_received_ts_ms is None:
+                continue
+            state.backlog = []
+            gaps.append((instrument_key, state, state.last_received_ts_ms))
+        self._backfill_task = asyncio.create_task(self._backfill(gaps))
+
+    async def _backfill(self, gaps):
+        """
+        Replays the candles each instrument missed while disconnected.
+
+        Args:
+            gaps (list): (instrument_key, state, after_ms) with state.backlog
+                already parking live candles
+        """
+        limit = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+        async def backfill_one(instrument_key, state, after_ms):
+            parked = state.backlog
+            start = time.perf_counter()
+            try:
+                async with limit:
+                    missed = await fetch_missing_candles(instrument_key, after_ms)
+            except Exception as e:
+                log_error("Backfill of %s failed: %s", instrument_key, e)
+                missed = []
+            finally:
+                # A newer backfill may have taken over the instrument
+                if state.backlog is parked:
+                    state.backlog = None
+
+            if self.states.get(instrument_key) is not state:
+                return
+            if parked:
+                missed = [candle for candle in missed if candle[0] < parked[0][0]]
+            for candle in missed + parked:
+                self._process(instrument_key, state, candle)
+            backfilled_candles.inc(len(missed))
+            backfill_seconds.observe(time.perf_counter() - start)
+            if missed:
+                log_info("Backfilled %d candles for %s", len(missed), instrument_key)
+
+        await asyncio.gather(*(backfill_one(*gap) for gap in gaps))
+
+    def _process(self, instrument_key, state, candle):
+        payload = process_minute_candle(state, candle)
+        if payload is None:
+            return
+        candles_processed.inc()
+        updates = self._updates(instrument_key, state, payload)
+        self._store(updates)
+        for update in updates:
+            self.on_update(update)
+
+    def _updates(self, instrument_key, state, payload):
+        """
+        The minute's Update followed by those of the higher-timeframe candles it changed.
+        """
+        updates = [Update(instrument_key, payload)]
+        for resampler in state.resamplers:
+            resampled = resampler.update(payload)
+            if resampled is not None:
+                updates.append(Update(instrument_key, resampled, resampler.timeframe))
+        return updates
+
+    def _store(self, updates):
+        for update in updates:
+            candle_store.upsert(update.instrument_key, update.payload, update.timeframe)
+        minute = updates[0].payload
+        if minute["alert"]:
+            alert_queue.publish(updates[0].instrument_key, minute["time"], minute["alert"])
+
+    def _handle_frame(self, msg):
+        start = time.perf_counter()
+        feed_response = decode_protobuf(msg)
+        decoded = time.perf_counter()
+        update_depth(feed_response, self.states)
+        aggregated = time.perf_counter()
+        candles = list(extract_minute_candles(feed_response, self.states))
+        decode_seconds.observe(decoded - start + time.perf_counter() - aggregated)
+        depth_seconds.observe(aggregated - decoded)
+
+        compute = store = fanout = 0.0
+        for instrument_key, candle in candles:
+            state = self.states[instrument_key]
+            if state.backlog is not None:
+                state.backlog.append(candle)
+                continue
+            t0 = time.perf_counter()
+            payload = process_minute_candle(state, candle)
+            if payload is None:
+                compute += time.perf_counter() - t0
+                continue
+            updates = self._updates(instrument_key, state, payload)
+            t1 = time.perf_counter()
+            compute += t1 - t0
+
+            candles_processed.inc()
+            self._store(updates)
+            t2 = time.perf_counter()
+            for update in updates:
+                self.on_update(update)
+            store += t2 - t1
+            fanout += time.perf_counter() - t2
+
+        compute_seconds.observe(compute)
+        store_seconds.observe(store)
+        fanout_seconds.observe(fanout)
+
+
+class FeedManager:
+    """
+    Multiplexes one stream of processed candles across every browser client
+    of this process.
+
+    The stream comes from a source with watch/unwatch/close: an in-process
+    UpstreamFeed (FEED_MODE=local), or a RedisFeedSource fed by a separate
+    ingestion worker (FEED_MODE=redis, see app.ingest) so that each
+    instrument is ingested once however many web workers serve it. Updates
+    are pushed to every subscriber's ClientChannel without waiting on any
+    client.
+    """
+
+    def __init__(self, client_queue_size=CLIENT_QUEUE_SIZE, client_queue_policy=CLIENT_QUEUE_POLICY, mode=FEED_MODE):
+        if mode not in FEED_MODES:
+            raise ValueError(f"Unknown feed mode {mode!r}, expected one of {FEED_MODES}")
+        self.client_queue_size = client_queue_size
+        self.client_queue_policy = client_queue_policy
+        self.subscribers = {}
+        # instrument_key -> the source.watch task still adding it
+        self._watches = {}
+        self._unwatches = set()
+        if mode == FEED_MODE_REDIS:
+            self.source = RedisFeedSource(redisClient, self.deliver)
+        else:
+            self.source = UpstreamFeed(self.deliver)
+
+    def open_channel(self, policy=None, label=""):
+        return ClientChannel(self.client_queue_size, policy or self.client_queue_policy, label)
+
+    async def subscribe(self, instrument_key, policy=None, timeframe=BASE_TIMEFRAME):
+        """
+        Registers a new client for one timeframe of an instrument and returns its ClientChannel.
+        """
+        queue = self.open_channel(policy, f"{instrument_key} {timeframe}")
+        await self.attach(queue, [instrument_key], timeframe)
+        return queue
+
+    async def unsubscribe(self, instrument_key, queue, timeframe=BASE_TIMEFRAME):
+        """
+        Removes a client channel, unwatching the instrument with the last one.
+        """
+        await self.detach(queue, [instrument_key], timeframe)
+
+    async def attach(self, queue, instrument_keys, timeframe=BASE_TIMEFRAME):
+        """
+        Routes updates of several instruments into one channel, watching the
+        newly demanded instruments with a single source call.
+
+        Channels attaching to an instrument whose watch is still in flight
+        wait for that watch. If it fails, every one of them is detached again
+        and gets its error, and the instruments are forgotten so the next
+        attach watches them afresh.
+        """
+        added = []
+        for instrument_key in instrument_keys:
+            timeframes = self.subscribers.setdefault(instrument_key, {})
+            if not timeframes:
+                added.append(instrument_key)
+            timeframes.setdefault(timeframe, set()).add(queue)
+        pending = {self._watches[key] for key in instrument_keys if key in self._watches}
+        if added:
+            watch = asyncio.ensure_future(self.source.watch(added))
+            watch.add_done_callback(partial(self._watch_done, added))
+            for instrument_key in added:
+                self._watches[instrument_key] = watch
+            pending.add(watch)
+        try:
+            for watch in pending:
+                # Shielded: one client leaving must not cancel a watch others wait on
+                await asyncio.shield(watch)
+        except BaseException:
+            removed = self._release(queue, instrument_keys, timeframe)
+            # Left without clients after another of its instruments failed
+            self._unwatch_later([key for key in removed if key not in self._watches])
+            raise
+
+    def _watch_done(self, instrument_keys, watch):
+        for instrument_key in instrument_keys:
+            if self._watches.get(instrument_key) is watch:
+                del self._watches[instrument_key]
+        if watch.cancelled() or watch.exception() is not None:
+            # Its attachers are failing with it; nothing is left watched
+            for instrument_key in instrument_keys:
+                if instrument_key not in self._watches:
+                    self.subscribers.pop(instrument_key, None)
+            return
+        # Everyone left while it was in flight, see detach
+        self._unwatch_later([key for key in instrument_keys if key not in self.subscribers and key not in self._watches])
+
+    def _unwatch_later(self, instrument_keys):
+        if instrument_keys:
+            task = asyncio.ensure_future(self._unwatch(instrument_keys))
+            self._unwatches.add(task)
+            task.add_done_callback(self._unwatches.discard)
+
+    async def _unwatch(self, instrument_keys):
+        try:
+            await self.source.unwatch(instrument_keys)
+        except Exception as e:
+            log_warning("Could not unwatch %d instruments: %s", len(instrument_keys), e)
+
+    async def detach(self, queue, instrument_keys, timeframe=BASE_TIMEFRAME):
+        """
+        Inverse of attach, unwatching the instruments left without clients.
+        """
+        removed = self._release(queue, instrument_keys, timeframe)
+        # Instruments still being watched are unwatched once that completes
+        removed = [key for key in removed if key not in self._watches]
+        if removed:
+            await self.source.unwatch(removed)
+
+    async def close_channel(self, queue):
+        """
+        Detaches a channel from every instrument and timeframe it is attached to.
+        """
+        attached = [
+            (instrument_key, timeframe)
+            for instrument_key, timeframes in self.subscribers.items()
+            for timeframe, queues in timeframes.items() if queue in queues
+        ]
+        removed = []
+        for instrument_key, timeframe in attached:
+            removed += self._release(queue, [instrument_key], timeframe)
+        removed = [key for key in removed if key not in self._watches]
+        if removed:
+            await self.source.unwatch(removed)
+
+    def _release(self, queue, instrument_keys, timeframe):
+        """
+        Removes a channel from instruments' subscribers.
+
+        Returns:
+            list: The instruments left without any subscriber
+        """
+        removed = []
+        for instrument_key in instrument_keys:
+            timeframes = self.subscribers.get(instrument_key)
+            if not timeframes or timeframe not in timeframes:
+                continue
+            queues = timeframes[timeframe]
+            queues.discard(queue)
+            if queues:
+                continue
+            del timeframes[timeframe]
+            if not timeframes:
+                del self.subscribers[instrument_key]
+                removed.append(instrument_key)
+        return removed
+
+    async def close(self):
+        await self.source.close()
+
+    def deliver(self, update):
+        timeframes = self.subscribers.get(update.instrument_key)
+        if timeframes:
+            for queue in timeframes.get(update.timeframe, ()):
+                queue.push(update)
+
+    def channels(self, instrument_key=None):
+        """
+        Every client channel, or those of one instrument.
+        """
+        if instrument_key is not None:
+            return {queue for queues in self.subscribers.get(instrument_key, {}).values() for queue in queues}
+        return {queue for timeframes in self.subscribers.values() for queues in timeframes.values() for queue in queues}
+
+    def client_stats(self):
+        return [queue.stats() for queue in self.channels()]
+
+
+feed_manager = FeedManager()
+
+metrics.gauge("feed_clients", "Connected clients per instrument", lambda: {
+    instrument_key: len(feed_manager.channels(instrument_key)) for instrument_key in feed_manager.subscribers
+}, label="instrument")
+metrics.gauge("fanout_queue_depth", "Updates pending in client queues, per instrument", lambda: {
+    instrument_key: sum(map(len, feed_manager.channels(instrument_key))) for instrument_key in feed_manager.subscribers
+}, label="instrument")
+metrics.gauge("fanout_max_lag_seconds", "Age of the oldest pending update across client queues", lambda: max(
+    (queue.lag_seconds() for queue in feed_manager.channels()), default=0.0,
+))
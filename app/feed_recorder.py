@@ -0,0 +1,53 @@
+import os
+import struct
+import time
+
+# Per frame: receive time (ns since epoch), payload length, then the raw protobuf bytes
+RECORD_HEADER = struct.Struct("<qI")
+
+FEED_RECORD_PATH = os.getenv("FEED_RECORD_PATH")
+
+
+class FeedRecorder:
+    """
+    Appends raw upstream frames to a length-prefixed recording file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab", buffering=1 << 16)
+
+    def write(self, frame, received_ns=None):
+        if received_ns is None:
+            received_ns = time.time_ns()
+        self._file.write(RECORD_HEADER.pack(received_ns, len(frame)))
+        self._file.write(frame)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_recording(path):
+    """
+    Yields (received_ns, frame) from a file written by FeedRecorder.
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            received_ns, length = RECORD_HEADER.unpack(header)
+            frame = f.read(length)
+            if len(frame) < length:
+                return
+            yield received_ns, frame
+
+
+def open_recorder():
+    """
+    Returns a recorder for FEED_RECORD_PATH, or None when recording is off.
+    """
+    return FeedRecorder(FEED_RECORD_PATH) if FEED_RECORD_PATH else None
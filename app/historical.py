@@ -0,0 +1,95 @@
+import numpy as np
+
+IST_OFFSET = np.timedelta64(5 * 3600 + 30 * 60, "s")
+IST_OFFSET_MS = (5 * 3600 + 30 * 60) * 1000
+COLUMNS = ("ts_ms", "open", "high", "low", "close", "volume")
+
+
+def parse_candle_times(timestamps):
+    """
+    Parses Upstox candle timestamps in bulk.
+
+    Upstox sends IST wall-clock times such as "2025-01-10T15:29:00+05:30". The
+    charts expect that wall-clock time read as UTC, so the offset is dropped
+    and the first 19 characters are parsed as a UTC datetime.
+
+    Args:
+        timestamps (list[str]): ISO-8601 candle timestamps
+
+    Returns:
+        np.ndarray: datetime64[s] array
+    """
+    return np.array(timestamps, dtype="U19").astype("datetime64[s]")
+
+
+def transform_candles(candle_list, unit):
+    """
+    Builds the price and volume chart series for a historical candle response.
+
+    Timestamps are parsed and shifted to IST as whole columns, the volume
+    OHLC is derived from each candle's volume and its predecessor's, and
+    both series are ordered with one stable sort at the end.
+
+    Args:
+        candle_list (list): Upstox candles as [ts, open, high, low, close, volume, oi]
+        unit (str): The requested unit; "days" charts use date strings as time
+
+    Returns:
+        tuple: (candles, volumes) as lists of {"time", "open", "high", "low", "close"}
+    """
+    if not candle_list:
+        return [], []
+
+    times = parse_candle_times([candle[0] for candle in candle_list])
+    if unit == "days":
+        time_values = (times + IST_OFFSET).astype("datetime64[D]").astype(str).tolist()
+    else:
+        time_values = times.astype(np.int64).tolist()
+
+    volume = np.asarray([candle[5] for candle in candle_list])
+    prev_volume = np.concatenate((volume[:1], volume[:-1]))
+    open_vol = prev_volume.tolist()
+    high_vol = np.maximum(prev_volume, volume).tolist()
+    low_vol = np.minimum(prev_volume, volume).tolist()
+    close_vol = volume.tolist()
+
+    order = np.argsort(times, kind="stable").tolist()
+
+    candles = [{
+        "time": time_values[i],
+        "open": candle_list[i][1],
+        "high": candle_list[i][2],
+        "low": candle_list[i][3],
+        "close": candle_list[i][4]
+    } for i in order]
+
+    volumes = [{
+        "time": time_values[i],
+        "open": open_vol[i],
+        "high": high_vol[i],
+        "low": low_vol[i],
+        "close": close_vol[i]
+    } for i in order]
+
+    return candles, volumes
+
+
+def columns_from_upstox(candle_list):
+    """
+    Converts Upstox candles ([ts, o, h, l, c, v, oi], newest first) to ascending columns.
+
+    Timestamps become epoch milliseconds, like the live feed's OHLC.ts.
+    """
+    if not candle_list:
+        return {name: np.empty(0) for name in COLUMNS}
+    wall_ms = parse_candle_times([candle[0] for candle in candle_list]).astype(np.int64) * 1000
+    values = np.asarray([candle[1:6] for candle in candle_list], dtype=float)
+    columns = {"ts_ms": wall_ms - IST_OFFSET_MS}
+    for i, name in enumerate(COLUMNS[1:]):
+        columns[name] = values[:, i]
+    return sort_columns(columns)
+
+
+def sort_columns(columns):
+    order = np.argsort(columns["ts_ms"], kind="stable")
+    return {name: np.asarray(values)[order] for name, values in columns.items()}
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import random
+import httpx
+
+UPSTOX_API_BASE = os.getenv("UPSTOX_API_BASE", "https://api.upstox.com")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client = None
+
+
+def get_client():
+    """
+    Returns the shared keep-alive client for the Upstox REST API.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=UPSTOX_API_BASE,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            headers={"Accept": "application/json"},
+        )
+    return _client
+
+
+async def get(path, headers=None, params=None, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+    """
+    GETs a path on the shared client, retrying transport errors and
+    throttled/5xx responses with jittered exponential backoff.
+
+    Args:
+        path (str): Path relative to UPSTOX_API_BASE
+        headers (dict or None): Extra request headers
+        params (dict or None): Query parameters
+        retries (int): Retries after the first attempt
+        backoff (float): Base delay in seconds, doubled per attempt
+
+    Returns:
+        httpx.Response: The last response received
+
+    Raises:
+        httpx.TransportError: If the final attempt fails to connect or times out
+    """
+    client = get_client()
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(path, headers=headers, params=params)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * (2 ** attempt) * (1 + random.random() / 4))
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
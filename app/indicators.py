@@ -0,0 +1,267 @@
+"""
+Incremental indicators for the live signal path, with batch references.
+
+Every indicator keeps O(1) state and is fed one candle at a time through
+update(candle), where candle is the (ts_ms, open, high, low, close, volume)
+tuple produced by websocket_stream.extract_minute_candles. The *_batch
+functions compute the same series over whole NumPy arrays for the backtest.
+
+VWAP, CVD and rolling CVD are vectorized. Recursive smoothing (EMA/RMA,
+used by ema_batch, rsi_batch and atr_batch) is not: _smooth is a scalar
+Python loop applying the live indicators' floating-point step, so both
+paths agree exactly and backtest --verify can compare signals bit for bit.
+A closed-form EMA would be vectorized but differs by rounding, enough to
+flip crossover ties on flat stretches. It costs roughly 0.1 us per value.
+"""
+from collections import deque
+import math
+import numpy as np
+from app.trade_signal_logic import compute_cvd_ohlc
+
+IST_OFFSET_MS = (5 * 3600 + 30 * 60) * 1000
+DAY_MS = 86_400_000
+
+
+def session_day(ts_ms):
+    """
+    IST trading day number of a timestamp, used to reset session indicators.
+    """
+    return (ts_ms + IST_OFFSET_MS) // DAY_MS
+
+
+class EMA:
+    """
+    Exponential moving average of close, seeded with the first close.
+    """
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, period=20):
+        self.alpha = 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, candle):
+        close = candle[4]
+        if self.value is None:
+            self.value = close
+        else:
+            self.value = self.value + self.alpha * (close - self.value)
+        return self.value
+
+
+class VWAP:
+    """
+    Session volume-weighted average of the typical price, reset each IST day.
+    """
+    __slots__ = ("day", "pv", "vol", "base_pv", "base_vol", "value")
+
+    def __init__(self):
+        self.day = None
+        self.pv = 0.0
+        self.vol = 0.0
+        self.base_pv = 0.0
+        self.base_vol = 0.0
+        self.value = math.nan
+
+    def update(self, candle):
+        ts_ms, _, high, low, close, volume = candle
+        day = session_day(ts_ms)
+        if day != self.day:
+            self.day = day
+            self.base_pv = self.pv
+            self.base_vol = self.vol
+        self.pv += (high + low + close) / 3.0 * volume
+        self.vol += volume
+        session_vol = self.vol - self.base_vol
+        self.value = (self.pv - self.base_pv) / session_vol if session_vol else math.nan
+        return self.value
+
+
+class RSI:
+    """
+    Wilder RSI of close; NaN until a previous close exists.
+    """
+    __slots__ = ("alpha", "prev_close", "avg_gain", "avg_loss", "value")
+
+    def __init__(self, period=14):
+        self.alpha = 1.0 / period
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.value = math.nan
+
+    def update(self, candle):
+        close = candle[4]
+        if self.prev_close is None:
+            self.prev_close = close
+            return self.value
+        change = close - self.prev_close
+        self.prev_close = close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        if self.avg_gain is None:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            self.avg_gain = self.avg_gain + self.alpha * (gain - self.avg_gain)
+            self.avg_loss = self.avg_loss + self.alpha * (loss - self.avg_loss)
+        self.value = rsi_value(self.avg_gain, self.avg_loss)
+        return self.value
+
+
+def rsi_value(avg_gain, avg_loss):
+    if avg_loss == 0:
+        return 50.0 if avg_gain == 0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class ATR:
+    """
+    Wilder average true range, seeded with the first candle's range.
+    """
+    __slots__ = ("alpha", "prev_close", "value")
+
+    def __init__(self, period=14):
+        self.alpha = 1.0 / period
+        self.prev_close = None
+        self.value = None
+
+    def update(self, candle):
+        _, _, high, low, close, _ = candle
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        if self.value is None:
+            self.value = true_range
+        else:
+            self.value = self.value + self.alpha * (true_range - self.value)
+        return self.value
+
+
+class CVD:
+    """
+    Cumulative volume delta as a synthetic candle: (cvd_open, cvd_high, cvd_low, cvd_close).
+    """
+    __slots__ = ("cum_delta", "value")
+
+    def __init__(self):
+        self.cum_delta = 0.0
+        self.value = None
+
+    def update(self, candle):
+        _, price_open, _, _, price_close, volume = candle
+        cvd_open, cvd_high, cvd_low, cvd_close, self.cum_delta = compute_cvd_ohlc(price_open, price_close, volume, self.cum_delta)
+        self.value = (cvd_open, cvd_high, cvd_low, cvd_close)
+        return self.value
+
+
+class RollingCVD:
+    """
+    Volume delta summed over the last `window` candles.
+    """
+    __slots__ = ("window", "cum_delta", "history", "value")
+
+    def __init__(self, window=30):
+        self.window = window
+        self.cum_delta = 0.0
+        self.history = deque([0.0], maxlen=window + 1)
+        self.value = 0.0
+
+    def update(self, candle):
+        _, price_open, _, _, price_close, volume = candle
+        *_, self.cum_delta = compute_cvd_ohlc(price_open, price_close, volume, self.cum_delta)
+        self.history.append(self.cum_delta)
+        self.value = self.cum_delta - self.history[0]
+        return self.value
+
+
+def _smooth(values, alpha):
+    """
+    value[i] = value[i-1] + alpha * (x[i] - value[i-1]), seeded with x[0].
+
+    Scalar reference loop over a list of floats, see the module docstring.
+    """
+    if len(values) == 0:
+        return np.asarray(values, dtype=float)
+    value = values[0]
+    smoothed = [value]
+    for x in values[1:]:
+        value = value + alpha * (x - value)
+        smoothed.append(value)
+    return np.asarray(smoothed)
+
+
+def ema_batch(close, period=20):
+    return _smooth(np.asarray(close, dtype=float).tolist(), 2.0 / (period + 1))
+
+
+def vwap_batch(ts_ms, high, low, close, volume):
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    volume = np.asarray(volume, dtype=float)
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3.0
+    cum_pv = np.cumsum(typical * volume)
+    cum_vol = np.cumsum(volume)
+
+    day = session_day(ts_ms)
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    session = np.cumsum(np.r_[True, day[1:] != day[:-1]]) - 1
+    base_pv = np.r_[0.0, cum_pv][starts][session]
+    base_vol = np.r_[0.0, cum_vol][starts][session]
+
+    session_vol = cum_vol - base_vol
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(session_vol != 0, (cum_pv - base_pv) / session_vol, np.nan)
+
+
+def rsi_batch(close, period=14):
+    close = np.asarray(close, dtype=float)
+    out = np.full(len(close), np.nan)
+    if len(close) < 2:
+        return out
+    change = np.diff(close)
+    avg_gain = _smooth(np.where(change > 0, change, 0.0).tolist(), 1.0 / period)
+    avg_loss = _smooth(np.where(change < 0, -change, 0.0).tolist(), 1.0 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+    out[1:] = rsi
+    return out
+
+
+def atr_batch(high, low, close, period=14):
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    if len(close) == 0:
+        return close
+    prev_close = np.r_[close[0], close[:-1]]
+    true_range = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    true_range[0] = high[0] - low[0]
+    return _smooth(true_range.tolist(), 1.0 / period)
+
+
+def volume_delta_batch(price_open, price_close, volume):
+    """
+    Per-candle signed volume, classified the same way as compute_cvd_ohlc.
+    """
+    price_open = np.asarray(price_open, dtype=float)
+    price_close = np.asarray(price_close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    up_vol = np.where(price_close > price_open, volume, 0.0)
+    down_vol = np.where(price_close < price_open, volume, 0.0)
+    return up_vol - down_vol
+
+
+def cvd_batch(price_open, price_close, volume):
+    """
+    Returns (cvd_open, cvd_high, cvd_low, cvd_close) arrays.
+    """
+    cum_delta = np.cumsum(volume_delta_batch(price_open, price_close, volume))
+    cvd_open = np.r_[0.0, cum_delta[:-1]]
+    return cvd_open, np.maximum(cvd_open, cum_delta), np.minimum(cvd_open, cum_delta), cum_delta
+
+
+def rolling_cvd_batch(price_open, price_close, volume, window=30):
+    cum_delta = np.r_[0.0, np.cumsum(volume_delta_batch(price_open, price_close, volume))]
+    lagged = np.r_[np.zeros(window), cum_delta][:len(cum_delta)]
+    return (cum_delta - lagged)[1:]
@@ -0,0 +1,121 @@
+"""
+Ingestion worker: holds the one Upstox connection for a FEED_MODE=redis
+deployment and publishes processed candles to the web workers.
+
+    python -m app.ingest
+
+Run exactly one per deployment. It subscribes upstream to whatever the web
+workers currently demand (see app.distribution), stores each candle once and
+publishes it on the instrument's updates channel. It also runs the alert
+sinks (see app.alerts), alongside any web workers that do.
+
+Set INGEST_METRICS_PORT to serve its /metrics for scraping. SIGUSR1 starts
+the sampling profiler and, sent again, stops it and writes the folded
+stacks to PROFILER_OUTPUT.
+"""
+import asyncio
+import os
+import signal
+from redis.exceptions import RedisError
+from app import http_client, metrics
+from app.alerts import alert_delivery
+from app.distribution import DEMAND_CHANNEL, DEMAND_TTL, demanded_instruments, publish_update
+from app.feed_manager import UpstreamFeed
+from app.logging import log_error, log_info
+from app.profiler import PROFILER_OUTPUT, profiler
+from app.redis import redisClient
+from app.redis_writer import redis_writer
+
+INGEST_METRICS_PORT = int(os.getenv("INGEST_METRICS_PORT", "0"))
+
+
+class IngestWorker:
+    """
+    Keeps an UpstreamFeed subscribed to the demanded instruments and publishes
+    its updates through the batched Redis writer.
+    """
+
+    def __init__(self, client=redisClient, writer=redis_writer):
+        self.client = client
+        self.writer = writer
+        self.upstream = UpstreamFeed(self.publish)
+
+    def publish(self, update):
+        publish_update(self.writer, update)
+
+    async def sync(self):
+        """
+        Matches the upstream subscription to the current demand.
+        """
+        wanted = await demanded_instruments(self.client)
+        current = set(self.upstream.states)
+        await self.upstream.unwatch(current - wanted)
+        await self.upstream.watch(wanted - current)
+
+    async def run(self):
+        pubsub = self.client.pubsub()
+        try:
+            while True:
+                try:
+                    if not pubsub.subscribed:
+                        await pubsub.subscribe(DEMAND_CHANNEL)
+                    await self.sync()
+                    # Resync on every demand change, and periodically to drop expired workers
+                    await pubsub.get_message(ignore_subscribe_messages=True, timeout=DEMAND_TTL / 3)
+                except RedisError as e:
+                    log_error("Redis error in ingestion worker: %s", e)
+                    await pubsub.aclose()
+                    pubsub = self.client.pubsub()
+                    await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+            await self.upstream.close()
+
+
+async def serve_metrics(reader, writer):
+    """
+    Minimal HTTP responder: every request gets the Prometheus exposition.
+    """
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = metrics.render_prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def toggle_profiler():
+    if profiler.running:
+        profiler.stop()
+        profiler.dump(PROFILER_OUTPUT)
+        log_info("Profiler stopped, %d samples written to %s", profiler.samples, PROFILER_OUTPUT)
+    else:
+        profiler.reset()
+        profiler.start()
+        log_info("Profiler started")
+
+
+async def main():
+    alert_delivery.start()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle_profiler)
+    server = None
+    if INGEST_METRICS_PORT:
+        server = await asyncio.start_server(serve_metrics, port=INGEST_METRICS_PORT)
+    try:
+        await IngestWorker().run()
+    finally:
+        if server is not None:
+            server.close()
+        await alert_delivery.close()
+        await redis_writer.close()
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,6 +18,9 @@ logging.basicConfig(
     ]
 )
 
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
 logger = logging.getLogger("stock-alert-system")
 
 def log_info(message, *args, **kwargs):
@@ -1,9 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.routes import router
+from app.alerts import alert_delivery
+from app.feed_manager import feed_manager
+from app.redis_writer import redis_writer
+from app import http_client
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    alert_delivery.start()
+    yield
+    await feed_manager.close()
+    await alert_delivery.close()
+    await redis_writer.close()
+    await http_client.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(router)
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
\ No newline at end of file
+app.mount("/static", StaticFiles(directory="app/static"), name="static")
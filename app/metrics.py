@@ -0,0 +1,145 @@
+import bisect
+import math
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REGISTRY = {}
+
+
+class Counter:
+    """
+    Monotonically increasing count.
+    """
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram of observed values.
+    """
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+        }
+
+
+class Gauge:
+    """
+    Point-in-time value, either set directly or read from fn at collection.
+
+    With a label name, fn returns {label_value: value} and the gauge is
+    exported as one series per label value.
+    """
+
+    def __init__(self, name, help_text="", fn=None, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+        self.label = label
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def collect(self):
+        return self.fn() if self.fn is not None else self.value
+
+    def snapshot(self):
+        return self.collect()
+
+
+def counter(name, help_text=""):
+    """
+    Returns the registered counter with this name, creating it on first use.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Counter(name, help_text)
+    return REGISTRY[name]
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS):
+    """
+    Returns the registered histogram with this name, creating it on first use.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Histogram(name, help_text, buckets)
+    return REGISTRY[name]
+
+
+def gauge(name, help_text="", fn=None, label=None):
+    """
+    Returns the registered gauge with this name, creating it on first use.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Gauge(name, help_text, fn, label)
+    return REGISTRY[name]
+
+
+def snapshot():
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, metric in REGISTRY.items():
+        if metric.help_text:
+            lines.append(f"# HELP {name} {metric.help_text}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {_format_value(metric.value)}")
+        elif isinstance(metric, Histogram):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, math.inf), metric.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{name}_sum {_format_value(metric.sum)}")
+            lines.append(f"{name}_count {metric.count}")
+        else:
+            lines.append(f"# TYPE {name} gauge")
+            value = metric.collect()
+            if metric.label is None:
+                lines.append(f"{name} {_format_value(value)}")
+            else:
+                for label_value, series_value in value.items():
+                    lines.append(f'{name}{{{metric.label}="{_label_value(label_value)}"}} {_format_value(series_value)}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,107 @@
+"""
+Sampling profiler that can be switched on and off in a running process.
+
+While running, a daemon thread wakes every interval, reads the current Python
+stack of the profiled thread (the event loop thread by default) through
+sys._current_frames() and counts it. Nothing is traced between samples, so
+the cost under load is one stack walk per interval, and none when stopped.
+
+Stacks are reported in folded form, one "outer;inner;leaf count" line per
+distinct stack, which flamegraph.pl and speedscope read directly.
+
+The web app exposes it under /debug/profiler when PROFILER_ENABLED=1; the
+ingestion worker toggles it on SIGUSR1.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from app import metrics
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_OUTPUT = os.getenv("PROFILER_OUTPUT", "profile.folded")
+MAX_DEPTH = 64
+
+samples_taken = metrics.counter("profiler_samples_total", "Stacks sampled by the profiler")
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Periodically samples one thread's stack into a Counter of folded stacks.
+    """
+
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, max_depth=MAX_DEPTH):
+        self.interval_ms = interval_ms
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=None, thread_id=None):
+        """
+        Starts sampling thread_id (default: the calling thread). No-op if running.
+        """
+        if self.running:
+            return
+        if interval_ms is not None:
+            self.interval_ms = interval_ms
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def folded(self, limit=None):
+        """
+        Collected stacks in folded form, most frequent first.
+        """
+        with self._lock:
+            stacks = self.stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def dump(self, path=PROFILER_OUTPUT):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+    def _sample_loop(self):
+        interval = self.interval_ms / 1000
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = ";".join(reversed(labels))
+            with self._lock:
+                self.stacks[stack] += 1
+                self.samples += 1
+            samples_taken.inc()
+
+
+profiler = SamplingProfiler()
+metrics.gauge("profiler_running", "1 while the sampling profiler is running", lambda: int(profiler.running))
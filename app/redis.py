@@ -1,3 +1,9 @@
-import redis
+import os
+import redis.asyncio as redis
 
-redisClient = redis.Redis(host='localhost', port=6379, db=0)
\ No newline at end of file
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+
+redisPool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, db=0, max_connections=REDIS_MAX_CONNECTIONS)
+redisClient = redis.Redis(connection_pool=redisPool)
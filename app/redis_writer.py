@@ -0,0 +1,89 @@
+import asyncio
+import inspect
+import os
+import time
+from app import metrics
+from app.logging import log_error
+from app.redis import redisClient
+
+FLUSH_INTERVAL = float(os.getenv("REDIS_FLUSH_INTERVAL_MS", "20")) / 1000
+MAX_BATCH = int(os.getenv("REDIS_MAX_BATCH", "500"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+batch_size = metrics.histogram("redis_batch_size", "Writes per Redis pipeline flush", BATCH_SIZE_BUCKETS)
+flush_latency = metrics.histogram("redis_flush_seconds", "Latency of one Redis pipeline flush")
+flush_errors = metrics.counter("redis_flush_errors_total", "Redis pipeline flushes that failed")
+
+
+class RedisBatchWriter:
+    """
+    Micro-batches Redis writes from the ingestion path into pipelines.
+
+    Writers enqueue callables that add commands to a pipeline. Everything
+    queued within one flush window, across instruments, goes out in a single
+    round-trip, so the event loop only ever awaits Redis in the background
+    flush task.
+    """
+
+    def __init__(self, client, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def enqueue(self, op):
+        """
+        Queues op(pipeline) for the next flush. Never blocks.
+
+        op may return an awaitable, which is awaited while building the pipeline.
+        """
+        self._pending.append(op)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+
+        pipe = self.client.pipeline(transaction=False)
+        start = time.perf_counter()
+        try:
+            for op in batch:
+                queued = op(pipe)
+                if inspect.isawaitable(queued):
+                    # Script calls are coroutines even when they only queue onto the pipeline
+                    await queued
+            await pipe.execute()
+        except Exception as e:
+            flush_errors.inc()
+            log_error("Redis flush of %d writes failed: %s", len(batch), e)
+        flush_latency.observe(time.perf_counter() - start)
+        batch_size.observe(len(batch))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+redis_writer = RedisBatchWriter(redisClient)
+metrics.gauge("redis_writer_pending", "Writes queued for the next Redis pipeline flush", lambda: len(redis_writer))
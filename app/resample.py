@@ -0,0 +1,204 @@
+"""
+Higher-timeframe candles built from the 1-minute stream.
+
+Each watched instrument carries one CandleResampler per timeframe in
+RESAMPLE_TIMEFRAMES (default 5m, 15m, 1h). Every processed minute updates the
+open bucket of each in O(1): price and CVD open come from the bucket's first
+minute, high/low are running extremes and close is the latest minute's.
+The resulting candles are stored next to the minutes in the candle store and
+served on the live websocket with ?timeframe=.
+
+Buckets are anchored at the NSE session open, 09:15 IST, so hourly candles
+run 09:15-10:15 and so on, as on exchange charts.
+
+resample_columns does the same aggregation over whole arrays, for rebuilding
+the higher-timeframe series from stored minutes:
+
+    python -m app.resample --instrument "NSE_EQ|INE002A01018"
+"""
+import argparse
+import asyncio
+import os
+import numpy as np
+
+BASE_TIMEFRAME = "1m"
+TIMEFRAMES = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+RESAMPLE_TIMEFRAMES = tuple(
+    name for name in filter(None, (name.strip() for name in os.getenv("RESAMPLE_TIMEFRAMES", "5m,15m,1h").split(",")))
+    if name != BASE_TIMEFRAME
+)
+
+# 09:15 IST as seconds after UTC midnight
+SESSION_ANCHOR = 3 * 3600 + 45 * 60
+
+CANDLE_COLUMNS = ("time", "open", "high", "low", "close", "cvd_open", "cvd_high", "cvd_low", "cvd_close")
+
+
+def bucket_start(ts_sec, seconds):
+    """
+    Start of the session-anchored bucket containing ts_sec (scalar or array).
+    """
+    return ts_sec - (ts_sec - SESSION_ANCHOR) % seconds
+
+
+def build_candle(ts_sec, timeframe, bar, alert):
+    """
+    Client payload for a resampled candle; same shape as a minute payload plus "timeframe".
+    """
+    p_open, p_high, p_low, p_close, v_open, v_high, v_low, v_close = bar
+    return {
+        "time": ts_sec,
+        "timeframe": timeframe,
+        "price": {"time": ts_sec, "open": p_open, "high": p_high, "low": p_low, "close": p_close},
+        "volume": {"time": ts_sec, "open": v_open, "high": v_high, "low": v_low, "close": v_close},
+        "alert": alert,
+    }
+
+
+class CandleResampler:
+    """
+    The open bucket of one higher timeframe for one instrument.
+
+    Args:
+        timeframe (str): A key of TIMEFRAMES
+    """
+    __slots__ = ("timeframe", "seconds", "time", "bar")
+
+    def __init__(self, timeframe):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe {timeframe!r}, expected one of {tuple(TIMEFRAMES)}")
+        self.timeframe = timeframe
+        self.seconds = TIMEFRAMES[timeframe]
+        self.time = None
+        self.bar = None
+
+    def update(self, payload):
+        """
+        Folds one minute payload into its bucket.
+
+        Returns:
+            dict or None: The bucket's candle as it stands, or None for a
+            minute older than the open bucket
+        """
+        ts_sec = bucket_start(payload["time"], self.seconds)
+        price = payload["price"]
+        volume = payload["volume"]
+        if self.time is None or ts_sec > self.time:
+            self.time = ts_sec
+            self.bar = [
+                price["open"], price["high"], price["low"], price["close"],
+                volume["open"], volume["high"], volume["low"], volume["close"],
+            ]
+        elif ts_sec == self.time:
+            bar = self.bar
+            if price["high"] > bar[1]:
+                bar[1] = price["high"]
+            if price["low"] < bar[2]:
+                bar[2] = price["low"]
+            bar[3] = price["close"]
+            if volume["high"] > bar[5]:
+                bar[5] = volume["high"]
+            if volume["low"] < bar[6]:
+                bar[6] = volume["low"]
+            bar[7] = volume["close"]
+        else:
+            return None
+        return build_candle(self.time, self.timeframe, self.bar, payload.get("alert"))
+
+    def seed(self, payloads):
+        """
+        Restores the open bucket from stored minutes (ascending), unless live
+        minutes already arrived.
+        """
+        if self.time is not None:
+            return
+        for payload in payloads:
+            self.update(payload)
+
+
+def candles_to_columns(payloads):
+    """
+    Stored minute payloads (ascending) as CANDLE_COLUMNS arrays.
+    """
+    values = np.asarray([(
+        payload["time"],
+        payload["price"]["open"], payload["price"]["high"], payload["price"]["low"], payload["price"]["close"],
+        payload["volume"]["open"], payload["volume"]["high"], payload["volume"]["low"], payload["volume"]["close"],
+    ) for payload in payloads], dtype=float).reshape(-1, len(CANDLE_COLUMNS))
+    columns = {name: values[:, i] for i, name in enumerate(CANDLE_COLUMNS)}
+    columns["time"] = columns["time"].astype(np.int64)
+    return columns
+
+
+def resample_columns(columns, timeframe):
+    """
+    Aggregates ascending CANDLE_COLUMNS arrays into `timeframe` buckets.
+
+    Gives the same candles as feeding the rows one by one to a CandleResampler.
+    """
+    times = np.asarray(columns["time"], dtype=np.int64)
+    if not len(times):
+        return {name: np.asarray(values)[:0] for name, values in columns.items()}
+    buckets = bucket_start(times, TIMEFRAMES[timeframe])
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    resampled = {"time": buckets[starts]}
+    for prefix in ("", "cvd_"):
+        resampled[prefix + "open"] = columns[prefix + "open"][starts]
+        resampled[prefix + "high"] = np.maximum.reduceat(columns[prefix + "high"], starts)
+        resampled[prefix + "low"] = np.minimum.reduceat(columns[prefix + "low"], starts)
+        resampled[prefix + "close"] = columns[prefix + "close"][ends]
+    return resampled
+
+
+def columns_to_candles(columns, timeframe):
+    rows = zip(*(columns[name].tolist() for name in CANDLE_COLUMNS))
+    return [build_candle(ts_sec, timeframe, bar, None) for ts_sec, *bar in rows]
+
+
+async def rebuild(store, instrument_key, timeframes=RESAMPLE_TIMEFRAMES, from_ts=None):
+    """
+    Recomputes the higher-timeframe candles and alerts of an instrument from
+    its stored minutes and queues them into the store.
+
+    Returns:
+        dict: timeframe -> number of candles written
+    """
+    if from_ts is not None:
+        # Start at a bucket boundary so no candle is rewritten from part of its minutes
+        from_ts = bucket_start(from_ts, max(TIMEFRAMES[timeframe] for timeframe in timeframes))
+    minutes = await store.get_range(instrument_key, from_ts=from_ts)
+    alerts = await store.get_alerts(instrument_key, from_ts=from_ts)
+    columns = candles_to_columns(minutes)
+    written = {}
+    for timeframe in timeframes:
+        candles = columns_to_candles(resample_columns(columns, timeframe), timeframe)
+        for candle in candles:
+            store.upsert(instrument_key, candle, timeframe)
+        seconds = TIMEFRAMES[timeframe]
+        for alert in alerts:
+            ts_sec = int(bucket_start(alert["time"], seconds))
+            store.upsert_alert(instrument_key, ts_sec, {"signal": alert["signal"], "text": alert["text"]}, timeframe)
+        written[timeframe] = len(candles)
+    return written
+
+
+async def main():
+    from app.candle_store import candle_store
+    from app.redis_writer import redis_writer
+
+    parser = argparse.ArgumentParser(description="Rebuild higher-timeframe candles from stored 1-minute candles")
+    parser.add_argument("--instrument", required=True, nargs="+")
+    parser.add_argument("--timeframe", nargs="+", choices=[name for name in TIMEFRAMES if name != BASE_TIMEFRAME],
+                        default=list(RESAMPLE_TIMEFRAMES))
+    parser.add_argument("--from-ts", type=int, help="only minutes at or after this epoch second")
+    args = parser.parse_args()
+
+    for instrument_key in args.instrument:
+        written = await rebuild(candle_store, instrument_key, args.timeframe, args.from_ts)
+        print(instrument_key, ", ".join(f"{timeframe}: {count}" for timeframe, count in written.items()))
+    await redis_writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,35 @@
-from fastapi import APIRouter, Request, Form, WebSocket
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, HTTPException, Request, Form, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
-from app.upstox_api import fetch_candle_data
-from app.websocket_stream import fetch_market_data
+from app.candle_cache import candle_cache
+from app.historical import transform_candles
+from app.feed_manager import feed_manager
+from app.fanout import COALESCE, POLICIES, ClientChannel
+from app.wire import FORMAT_BINARY, FORMAT_JSON, FORMATS, MAX_BATCH, Update, encode_binary
 import plotly.graph_objects as go
-from datetime import datetime
 import asyncio
-from app.state import clients
-from app.redis import redisClient
-from datetime import datetime, timedelta, timezone
 import json
+import time
+from app.state import clients
+from app.candle_store import candle_store
+from app import metrics
+from app.logging import log_debug, log_warning
+from redis.exceptions import RedisError
+from app.profiler import PROFILER_ENABLED, profiler
+from app.resample import BASE_TIMEFRAME, RESAMPLE_TIMEFRAMES
+from app.watchlist import (
+    SUBSCRIBE,
+    WATCHLIST_MAX_BATCH,
+    WATCHLIST_QUEUE_PER_INSTRUMENT,
+    Watchlist,
+    parse_command,
+)
+
+LIVE_WINDOW = 375  # one NSE session of 1-minute candles
+MAX_HISTORY_PAGE = 5000
+LIVE_TIMEFRAMES = (BASE_TIMEFRAME, *RESAMPLE_TIMEFRAMES)
 
-IST = timezone(timedelta(hours=5, minutes=30))
-UTC = timezone.utc
+client_send_seconds = metrics.histogram("client_send_seconds", "Websocket send of one batch to a browser client")
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -31,107 +48,280 @@ async def fetch(
     to_date: str = Form(...),
     from_date: str = Form(...)
 ):
-    data = fetch_candle_data(instrument_key, unit, interval, to_date, from_date)
+    data = await candle_cache.get_candles(instrument_key, unit, interval, to_date, from_date)
     if not data or "data" not in data:
         return templates.TemplateResponse("periodicChart.html", {"request": request, "candles": [], "volumes": []})
 
-    candle_list = data["data"]["candles"]
+    candles, volumes = transform_candles(data["data"]["candles"], unit)
 
-    candles = []
-    volumes = []
+    return templates.TemplateResponse("periodicChart.html", {
+        "request": request,
+        "candles": candles,
+        "volumes": volumes
+    })
+
+@router.websocket("/ws/live/{instrument_key}")
+async def live_data(
+    websocket: WebSocket,
+    instrument_key: str,
+    since: int | None = None,
+    policy: str | None = None,
+    format: str = FORMAT_JSON,
+    timeframe: str = BASE_TIMEFRAME
+):
+    reason = invalid_stream_params(policy, format, timeframe)
+    if reason is not None:
+        await websocket.close(code=1008, reason=reason)
+        return
+    await websocket.accept()
+    clients.add(websocket)
 
-    prev_volume = candle_list[0][5]
+    queue = sender = None
+    try:
+        queue = await feed_manager.subscribe(instrument_key, policy, timeframe)
+        if since is not None:
+            # Candles stored between the page render and this connection; the
+            # candle open at `since` may have changed too on higher timeframes
+            from_ts = since + 1 if timeframe == BASE_TIMEFRAME else since
+            backfill = await candle_store.get_range(instrument_key, from_ts=from_ts, limit=LIVE_WINDOW, timeframe=timeframe)
+            for i in range(0, len(backfill), MAX_BATCH):
+                batch = [Update(instrument_key, candle, timeframe) for candle in backfill[i:i + MAX_BATCH]]
+                await send_updates(websocket, batch, format)
+        sender = asyncio.create_task(forward_updates(websocket, queue, format))
 
-    for candle in candle_list:
-        dt = datetime.fromisoformat(candle[0]).replace(tzinfo=UTC)
-        dt = dt.astimezone(IST)
+        while True:
+            await websocket.receive_text()
+    except (WebSocketDisconnect, RuntimeError):
+        log_debug("Socket being removed")
+    finally:
+        if sender is not None:
+            sender.cancel()
+        if queue is not None:
+            await feed_manager.unsubscribe(instrument_key, queue, timeframe)
+        clients.discard(websocket)
 
-        timestamp = int(dt.timestamp())
+@router.websocket("/ws/watchlist")
+async def watchlist_data(
+    websocket: WebSocket,
+    policy: str | None = None,
+    format: str = FORMAT_JSON,
+    timeframe: str = BASE_TIMEFRAME
+):
+    """
+    Live candles of many instruments on one socket; the protocol is described in app.watchlist.
+    """
+    reason = invalid_stream_params(policy, format, timeframe)
+    if reason is not None:
+        await websocket.close(code=1008, reason=reason)
+        return
+    await websocket.accept()
+    clients.add(websocket)
 
-        if unit == "days":
-            time_value = dt.strftime("%Y-%m-%d")
-        else:
-            time_value = int(dt.timestamp())
+    watchlist = Watchlist()
+    queue = feed_manager.open_channel(policy or COALESCE, f"watchlist {timeframe}")
+    sender = asyncio.create_task(forward_updates(websocket, queue, format, watchlist))
 
-        candles.append({
-            "time": time_value,
-            "open": candle[1],
-            "high": candle[2],
-            "low": candle[3],
-            "close": candle[4]
-        })
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                action, instrument_keys = parse_command(text)
+                if action == SUBSCRIBE:
+                    added = watchlist.add(instrument_keys)
+                else:
+                    removed = watchlist.remove(instrument_keys)
+            except ValueError as e:
+                await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                continue
 
-        current_volume = candle[5]
-        open_vol = prev_volume
-        close_vol = current_volume
-        high_vol = max(open_vol, close_vol)
-        low_vol = min(open_vol, close_vol)
+            async with watchlist.lock:
+                queue.maxsize = max(feed_manager.client_queue_size, WATCHLIST_QUEUE_PER_INSTRUMENT * len(watchlist))
+                if action == SUBSCRIBE:
+                    if added and not await attach_watchlist(queue, list(added), timeframe):
+                        watchlist.remove(added)
+                        reply = {"type": "error", "message": "could not subscribe, try again"}
+                    else:
+                        reply = {"type": "subscribed", "instruments": added}
+                else:
+                    await feed_manager.detach(queue, removed, timeframe)
+                    reply = {"type": "unsubscribed", "instruments": removed}
+                await websocket.send_text(json.dumps(reply))
+    except (WebSocketDisconnect, RuntimeError):
+        log_debug("Watchlist socket being removed")
+    finally:
+        sender.cancel()
+        await feed_manager.detach(queue, list(watchlist.slots), timeframe)
+        clients.discard(websocket)
 
-        volumes.append({
-            "time": time_value,
-            "open": open_vol,
-            "high": high_vol,
-            "low": low_vol,
-            "close": close_vol
-        })
+async def attach_watchlist(queue, instrument_keys, timeframe):
+    """
+    Attaches newly watched instruments to a watchlist channel, queuing each
+    one's latest stored candle first so live updates follow (or coalesce onto) it.
 
-        prev_volume = current_volume
+    Returns:
+        bool: False if the feed could not watch them
+    """
+    try:
+        latest = await candle_store.get_many(instrument_keys, limit=1, timeframe=timeframe)
+    except RedisError as e:
+        log_warning("Could not load latest candles for a watchlist: %s", e)
+        latest = {}
+    for instrument_key, candles in latest.items():
+        for candle in candles:
+            queue.push(Update(instrument_key, candle, timeframe))
+    try:
+        await feed_manager.attach(queue, instrument_keys, timeframe)
+    except Exception as e:
+        log_warning("Watchlist could not watch %d instruments: %s", len(instrument_keys), e)
+        return False
+    return True
 
-        candles.sort(key=lambda x: x["time"])
-        volumes.sort(key=lambda x: x["time"])
+def invalid_stream_params(policy, format, timeframe):
+    """
+    Checks the query parameters shared by the live sockets.
 
-    return templates.TemplateResponse("periodicChart.html", {
-        "request": request,
-        "candles": candles,
-        "volumes": volumes
-    })
+    Returns:
+        str or None: The close reason, or None if they are valid
+    """
+    if policy is not None and policy not in POLICIES:
+        return f"policy must be one of {', '.join(POLICIES)}"
+    if format not in FORMATS:
+        return f"format must be one of {', '.join(FORMATS)}"
+    if timeframe not in LIVE_TIMEFRAMES:
+        return f"timeframe must be one of {', '.join(LIVE_TIMEFRAMES)}"
+    return None
 
-@router.websocket("/ws/live/{instrument_key}")
-async def live_data(websocket: WebSocket, instrument_key: str):
-    await websocket.accept()
-    clients.add(websocket)
+async def send_updates(websocket: WebSocket, updates, format):
+    """
+    Sends updates in the client's wire format: one binary frame per batch, or one JSON message each.
+    """
+    if format == FORMAT_BINARY:
+        await websocket.send_bytes(encode_binary(updates))
+    else:
+        for update in updates:
+            await websocket.send_text(update.json())
 
-    asyncio.create_task(fetch_market_data([instrument_key], websocket))
+async def forward_updates(websocket: WebSocket, queue: ClientChannel, format=FORMAT_JSON, watchlist=None):
+    """
+    Drains a client's channel into its websocket, closing it if the client fell too far behind.
 
+    With a watchlist, everything pending goes out as one multi-instrument message.
+    However sending ends, the channel is detached from the feed.
+    """
+    if watchlist is not None:
+        max_items = WATCHLIST_MAX_BATCH
+    else:
+        max_items = MAX_BATCH if format == FORMAT_BINARY else 1
     try:
         while True:
-            await websocket.receive_text()
-    except:
-        print('Socket being removed')
-        clients.remove(websocket)
+            updates = await queue.get_batch(max_items)
+            if updates is None:
+                await websocket.close(code=1013, reason="client too slow")
+                return
+            start = time.perf_counter()
+            if watchlist is not None:
+                async with watchlist.lock:
+                    message = watchlist.encode(updates, format)
+                    if isinstance(message, bytes):
+                        await websocket.send_bytes(message)
+                    elif message is not None:
+                        await websocket.send_text(message)
+            else:
+                await send_updates(websocket, updates, format)
+            client_send_seconds.observe(time.perf_counter() - start)
+    except Exception as e:
+        # Disconnects surface as WebSocketDisconnect, RuntimeError, OSError or server-specific errors
+        log_debug("Client websocket send failed: %s", e)
+    finally:
+        try:
+            await feed_manager.close_channel(queue)
+        except Exception as e:
+            log_warning("Could not detach client channel: %s", e)
+
+async def load_history_page(instrument_key, before=None, limit=LIVE_WINDOW, timeframe=BASE_TIMEFRAME):
+    """
+    Loads the newest `limit` candles of a timeframe strictly before `before`
+    (or the latest ones), plus the alerts in the same span.
+
+    Returns:
+        tuple: (candles, alerts, next_before) where next_before is the cursor for
+        the next older page, or None when history is exhausted
+    """
+    to_ts = None if before is None else before - 1
+    candles = await candle_store.get_range(instrument_key, to_ts=to_ts, limit=limit, timeframe=timeframe)
+    if not candles:
+        return [], [], None
+    alerts = await candle_store.get_alerts(instrument_key, from_ts=candles[0]["time"], to_ts=to_ts, timeframe=timeframe)
+    next_before = candles[0]["time"] if len(candles) == limit else None
+    return candles, alerts, next_before
 
 @router.get("/live/{instrument_key}", response_class=HTMLResponse)
-async def live_page(request: Request, instrument_key: str):
-    price_key = f"{instrument_key}:price"
-    volume_key = f"{instrument_key}:volume"
-    timestamp_key = f"{instrument_key}:timestamp"
-    alert_key = f"{instrument_key}:alerts"
-
-    prices = redisClient.lrange(price_key, 0, -1) or []
-    volumes = redisClient.lrange(volume_key, 0, -1) or []
-    timestamps = redisClient.smembers(timestamp_key) or []
-    alerts = redisClient.smembers(alert_key) or []
-
-    prices = [json.loads(p) for p in prices]
-    volumes = [json.loads(v) for v in volumes]
-    alerts = [json.loads(a) for a in alerts]
-    timestamps = [int(ts) for ts in timestamps]
-    timestamps.sort()
-
-    historical_data = []
-    for ts, price, volume in zip(timestamps, prices, volumes):
-        historical_data.append({
-            "time": ts,
-            "price": price,
-            "volume": volume
-        })
+async def live_page(request: Request, instrument_key: str, timeframe: str = BASE_TIMEFRAME):
+    if timeframe not in LIVE_TIMEFRAMES:
+        raise HTTPException(status_code=422, detail=f"timeframe must be one of {', '.join(LIVE_TIMEFRAMES)}")
+    historical_data, alerts, next_before = await load_history_page(instrument_key, timeframe=timeframe)
 
     return templates.TemplateResponse(
         "liveChart.html",
         {
             "request": request,
             "instrument_key": instrument_key,
+            "timeframe": timeframe,
+            "timeframes": LIVE_TIMEFRAMES,
             "historical_data": historical_data,
-            "alerts": alerts
+            "alerts": alerts,
+            "next_before": next_before
         }
     )
+
+@router.get("/api/history/{instrument_key}")
+async def history(
+    instrument_key: str,
+    before: int | None = None,
+    limit: int = Query(LIVE_WINDOW, ge=1, le=MAX_HISTORY_PAGE),
+    timeframe: str = BASE_TIMEFRAME
+):
+    if timeframe not in LIVE_TIMEFRAMES:
+        raise HTTPException(status_code=422, detail=f"timeframe must be one of {', '.join(LIVE_TIMEFRAMES)}")
+    candles, alerts, next_before = await load_history_page(instrument_key, before, limit, timeframe)
+    return {
+        "candles": candles,
+        "alerts": alerts,
+        "next_before": next_before
+    }
+
+@router.get("/stats")
+async def stats():
+    return metrics.snapshot()
+
+@router.get("/stats/clients")
+async def client_stats():
+    return feed_manager.client_stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled, set PROFILER_ENABLED=1")
+
+@router.post("/debug/profiler/start")
+async def start_profiler(interval_ms: float | None = Query(None, gt=0), reset: bool = True):
+    require_profiler()
+    if reset and not profiler.running:
+        profiler.reset()
+    # Called on the event loop thread, which is the one sampled
+    profiler.start(interval_ms)
+    return {"running": profiler.running, "interval_ms": profiler.interval_ms}
+
+@router.post("/debug/profiler/stop")
+async def stop_profiler():
+    require_profiler()
+    profiler.stop()
+    return {"running": profiler.running, "samples": profiler.samples}
+
+@router.get("/debug/profiler", response_class=PlainTextResponse)
+async def profiler_stacks(limit: int | None = Query(None, ge=1)):
+    require_profiler()
+    return PlainTextResponse(profiler.folded(limit))
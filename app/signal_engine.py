@@ -0,0 +1,79 @@
+import os
+from functools import partial
+from app.indicators import ATR, CVD, EMA, RSI, VWAP, RollingCVD
+from app.trade_signal_logic import cvd_engulfing, ema_cross_vwap, tick_cvd_imbalance
+
+
+class Strategy:
+    """
+    A named combination of indicators and a rule over their values.
+
+    Args:
+        name (str): Strategy name, as selected by SIGNAL_STRATEGY
+        indicators (dict): Indicator name -> zero-argument factory
+        rule (callable): rule(candle, values, prev_values) -> "BUY", "SELL" or None
+        needs_depth (bool): Whether the rule reads the app.depth aggregates,
+            which are only computed for such strategies (or DEPTH_ENABLED=1)
+    """
+
+    def __init__(self, name, indicators, rule, needs_depth=False):
+        self.name = name
+        # The volume chart always plots CVD, whatever the strategy uses
+        self.indicators = {"cvd": CVD, **indicators}
+        self.rule = rule
+        self.needs_depth = needs_depth
+
+    def new_state(self):
+        return StrategyState(self)
+
+
+class StrategyState:
+    """
+    Per-instrument indicator state for one strategy; O(1) work per candle.
+    """
+    __slots__ = ("strategy", "indicators", "prev_values")
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.indicators = {name: factory() for name, factory in strategy.indicators.items()}
+        self.prev_values = None
+
+    def update(self, candle, features=None):
+        """
+        Feeds one candle to every indicator and evaluates the rule.
+
+        Args:
+            candle (tuple): (ts_ms, open, high, low, close, volume)
+            features (dict or None): Extra values computed outside the indicators,
+                e.g. the order-book and tick aggregates from app.depth
+
+        Returns:
+            tuple: (values, signal)
+        """
+        values = {name: indicator.update(candle) for name, indicator in self.indicators.items()}
+        if features:
+            values.update(features)
+        signal = self.strategy.rule(candle, values, self.prev_values)
+        self.prev_values = values
+        return values, signal
+
+
+STRATEGIES = {
+    "cvd_engulfing": Strategy("cvd_engulfing", {}, cvd_engulfing),
+    "ema_cross_vwap": Strategy(
+        "ema_cross_vwap",
+        {
+            "ema_fast": partial(EMA, 9),
+            "ema_slow": partial(EMA, 21),
+            "vwap": VWAP,
+            "rsi": partial(RSI, 14),
+            "rolling_cvd": partial(RollingCVD, 30),
+            "atr": partial(ATR, 14),
+        },
+        ema_cross_vwap,
+    ),
+    # Needs the live depth aggregates; never fires in backtests
+    "tick_cvd_imbalance": Strategy("tick_cvd_imbalance", {}, tick_cvd_imbalance, needs_depth=True),
+}
+
+DEFAULT_STRATEGY = STRATEGIES[os.getenv("SIGNAL_STRATEGY", "cvd_engulfing")]
@@ -1,6 +1,10 @@
+const HISTORY_PAGE_SIZE = 375;
+const LOAD_OLDER_THRESHOLD = 10;
+
 document.addEventListener("DOMContentLoaded", () => {
     const container = document.querySelector(".main-container");
     const instrumentKey = container.dataset.instrument;
+    const timeframe = container.dataset.timeframe || "1m";
     const historicalData = Array.isArray(container.dataset.historical)
         ? container.dataset.historical
         : JSON.parse(container.dataset.historical || "[]");
@@ -8,6 +12,8 @@ document.addEventListener("DOMContentLoaded", () => {
         ? container.dataset.alerts
         : JSON.parse(container.dataset.alerts || "[]");
 
+    let nextBefore = container.dataset.nextBefore ? parseInt(container.dataset.nextBefore, 10) : null;
+    let loadingOlder = false;
     let alertMarkers = [];
 
     const chartOptions = { 
@@ -42,15 +48,21 @@ document.addEventListener("DOMContentLoaded", () => {
     });
     volumeChart.timeScale().fitContent();
 
-    function addAlertMarker(time, text, type = "up") {
-        alertMarkers.push({
+    const seriesMarkers = LightweightCharts.createSeriesMarkers(volumeCandles, []);
+
+    function toMarker(time, text, type) {
+        return {
             time,
             position: type === "BUY" ? "aboveBar" : "belowBar",
             color: type === "BUY" ? "#26a69a" : "#ef5350",
             shape: type === "BUY" ? "arrowUp" : "arrowDown",
             text
-        });
-        LightweightCharts.createSeriesMarkers(volumeCandles, alertMarkers);
+        };
+    }
+
+    function addAlertMarker(time, text, type = "up") {
+        alertMarkers.push(toMarker(time, text, type));
+        seriesMarkers.setMarkers(alertMarkers);
     }
 
     function mapCandleData(data, key) {
@@ -65,35 +77,140 @@ document.addEventListener("DOMContentLoaded", () => {
             }));
     }
 
-    candleSeries.setData(mapCandleData(historicalData, "price"));
-    volumeCandles.setData(mapCandleData(historicalData, "volume"));
+    // Local copies of what each series shows, so older pages can be prepended
+    let priceBars = mapCandleData(historicalData, "price");
+    let volumeBars = mapCandleData(historicalData, "volume");
+    candleSeries.setData(priceBars);
+    volumeCandles.setData(volumeBars);
+
+    alertMarkers = historicalAlerts.map(alert => toMarker(alert.time, alert.text, alert.signal));
+    seriesMarkers.setMarkers(alertMarkers);
+
+    function upsertBar(bars, bar) {
+        if (bars.length && bars[bars.length - 1].time === bar.time) {
+            bars[bars.length - 1] = bar;
+        } else {
+            bars.push(bar);
+        }
+    }
+
+    async function loadOlder() {
+        if (loadingOlder || nextBefore == null) {
+            return;
+        }
+        loadingOlder = true;
+        try {
+            const params = new URLSearchParams({ before: nextBefore, limit: HISTORY_PAGE_SIZE, timeframe });
+            const response = await fetch(`/api/history/${encodeURIComponent(instrumentKey)}?${params}`);
+            if (!response.ok) {
+                return;
+            }
+            const page = await response.json();
+            nextBefore = page.next_before;
+            if (!page.candles.length) {
+                return;
+            }
+
+            const olderPrice = mapCandleData(page.candles, "price");
+            const added = olderPrice.length;
+            const priceRange = priceChart.timeScale().getVisibleLogicalRange();
+            const volumeRange = volumeChart.timeScale().getVisibleLogicalRange();
+
+            priceBars = olderPrice.concat(priceBars);
+            volumeBars = mapCandleData(page.candles, "volume").concat(volumeBars);
+            candleSeries.setData(priceBars);
+            volumeCandles.setData(volumeBars);
+
+            // Keep the view where the user was instead of jumping by the prepended bars
+            if (priceRange) {
+                priceChart.timeScale().setVisibleLogicalRange({ from: priceRange.from + added, to: priceRange.to + added });
+            }
+            if (volumeRange) {
+                volumeChart.timeScale().setVisibleLogicalRange({ from: volumeRange.from + added, to: volumeRange.to + added });
+            }
 
-    historicalAlerts.forEach(alert => {
-        addAlertMarker(alert.time, alert.text, alert.signal);
+            alertMarkers = page.alerts.map(alert => toMarker(alert.time, alert.text, alert.signal)).concat(alertMarkers);
+            seriesMarkers.setMarkers(alertMarkers);
+        } finally {
+            loadingOlder = false;
+        }
+    }
+
+    priceChart.timeScale().subscribeVisibleLogicalRangeChange(range => {
+        if (range && range.from < LOAD_OLDER_THRESHOLD) {
+            loadOlder();
+        }
     });
 
-    const ws = new WebSocket(`ws://${window.location.host}/ws/live/${instrumentKey}`);
-    ws.onmessage = (event) => {
-        const tick = JSON.parse(event.data);
+    const lastTime = historicalData.length ? historicalData[historicalData.length - 1].time : null;
+    const query = new URLSearchParams({ format: "binary", timeframe });
+    if (lastTime != null) {
+        query.set("since", lastTime);
+    }
+    const ws = new WebSocket(`ws://${window.location.host}/ws/live/${encodeURIComponent(instrumentKey)}?${query}`);
+    ws.binaryType = "arraybuffer";
 
+    // Layout documented in app/wire.py
+    const RECORD_SIZE = 73;
+    const SIGNALS = [null, { signal: "BUY", text: "buy" }, { signal: "SELL", text: "sell" }];
+
+    function decodeBinaryFrame(buffer) {
+        const view = new DataView(buffer);
+        const count = view.getUint16(2, true);
+        const ticks = new Array(count);
+        for (let i = 0, offset = 4; i < count; i++, offset += RECORD_SIZE) {
+            ticks[i] = {
+                time: Number(view.getBigInt64(offset, true)),
+                price: {
+                    open: view.getFloat64(offset + 8, true),
+                    high: view.getFloat64(offset + 16, true),
+                    low: view.getFloat64(offset + 24, true),
+                    close: view.getFloat64(offset + 32, true)
+                },
+                volume: {
+                    open: view.getFloat64(offset + 40, true),
+                    high: view.getFloat64(offset + 48, true),
+                    low: view.getFloat64(offset + 56, true),
+                    close: view.getFloat64(offset + 64, true)
+                },
+                alert: SIGNALS[view.getUint8(offset + 72)]
+            };
+        }
+        return ticks;
+    }
+
+    function applyTick(tick) {
         if (tick.alert) {
-            addAlertMarker(tick.price.time, tick.alert.text, tick.alert.signal);
+            addAlertMarker(tick.time, tick.alert.text, tick.alert.signal);
         }
 
-        candleSeries.update({
-            time: tick.price.time,
-            open: parseFloat(tick.price.open),
-            high: parseFloat(tick.price.high),
-            low: parseFloat(tick.price.low),
-            close: parseFloat(tick.price.close)
-        });
-
-        volumeCandles.update({
-            time: tick.price.time,
-            open: parseFloat(tick.volume.open),
-            high: parseFloat(tick.volume.high),
-            low: parseFloat(tick.volume.low),
-            close: parseFloat(tick.volume.close)
-        });
+        const priceBar = {
+            time: tick.time,
+            open: tick.price.open,
+            high: tick.price.high,
+            low: tick.price.low,
+            close: tick.price.close
+        };
+        const volumeBar = {
+            time: tick.time,
+            open: tick.volume.open,
+            high: tick.volume.high,
+            low: tick.volume.low,
+            close: tick.volume.close
+        };
+
+        candleSeries.update(priceBar);
+        volumeCandles.update(volumeBar);
+        upsertBar(priceBars, priceBar);
+        upsertBar(volumeBars, volumeBar);
+    }
+
+    ws.onmessage = (event) => {
+        if (typeof event.data === "string") {
+            // JSON fallback: one update per message
+            applyTick(JSON.parse(event.data));
+            return;
+        }
+        decodeBinaryFrame(event.data).forEach(applyTick);
     };
 });
\ No newline at end of file
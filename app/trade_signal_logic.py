@@ -1,3 +1,8 @@
+import math
+
+BOOK_IMBALANCE_THRESHOLD = 0.2
+
+
 def compute_cvd_ohlc(price_open, price_close, volume, prev_cum_delta=None):
     """
     Compute synthetic CVD OHLC values from price + volume.
@@ -35,3 +40,90 @@ def compute_cvd_ohlc(price_open, price_close, volume, prev_cum_delta=None):
     cvd_low = min(cvd_open, cvd_close)
 
     return cvd_open, cvd_high, cvd_low, cvd_close, cum_delta
+
+
+def cvd_engulfing(candle, values, prev_values):
+    """
+    BUY when a green candle closes with CVD rising through its open and above the
+    previous CVD close; SELL on the mirrored red-candle condition.
+
+    Args:
+        candle (tuple): (ts_ms, open, high, low, close, volume)
+        values (dict): Indicator values for this candle
+        prev_values (dict or None): Indicator values for the previous candle
+
+    Returns:
+        str or None: "BUY", "SELL" or None
+    """
+    if prev_values is None:
+        return None
+
+    price_open, price_close = candle[1], candle[4]
+    cvd_open, _, _, cvd_close = values["cvd"]
+    prev_cvd_close = prev_values["cvd"][3]
+
+    # Bullish engulfing style
+    if price_close > price_open and cvd_close > cvd_open and cvd_close > prev_cvd_close:
+        return "BUY"
+    # Bearish engulfing style
+    if price_close < price_open and cvd_close < cvd_open and cvd_close < prev_cvd_close:
+        return "SELL"
+    return None
+
+
+def ema_cross_vwap(candle, values, prev_values):
+    """
+    BUY when the fast EMA crosses above the slow EMA with price above VWAP,
+    rolling CVD positive and RSI not overbought; SELL on the mirror image.
+
+    Args:
+        candle (tuple): (ts_ms, open, high, low, close, volume)
+        values (dict): Indicator values for this candle
+        prev_values (dict or None): Indicator values for the previous candle
+
+    Returns:
+        str or None: "BUY", "SELL" or None
+    """
+    if prev_values is None:
+        return None
+
+    price_close = candle[4]
+    crossed_up = prev_values["ema_fast"] <= prev_values["ema_slow"] and values["ema_fast"] > values["ema_slow"]
+    crossed_down = prev_values["ema_fast"] >= prev_values["ema_slow"] and values["ema_fast"] < values["ema_slow"]
+
+    if crossed_up and price_close > values["vwap"] and values["rolling_cvd"] > 0 and values["rsi"] < 70:
+        return "BUY"
+    if crossed_down and price_close < values["vwap"] and values["rolling_cvd"] < 0 and values["rsi"] > 30:
+        return "SELL"
+    return None
+
+
+def tick_cvd_imbalance(candle, values, prev_values):
+    """
+    BUY when a green candle is backed by tick CVD rising through the candle
+    and resting bids outweighing asks by more than BOOK_IMBALANCE_THRESHOLD;
+    SELL on the mirror image. Needs the "tick_cvd" and "book_imbalance"
+    values from the live depth aggregator.
+
+    Args:
+        candle (tuple): (ts_ms, open, high, low, close, volume)
+        values (dict): Indicator values for this candle
+        prev_values (dict or None): Indicator values for the previous candle
+
+    Returns:
+        str or None: "BUY", "SELL" or None
+    """
+    if prev_values is None or "tick_cvd" not in values:
+        return None
+
+    price_open, price_close = candle[1], candle[4]
+    tick_open, _, _, tick_close = values["tick_cvd"]
+    imbalance = values["book_imbalance"]
+    if math.isnan(imbalance):
+        return None
+
+    if price_close > price_open and tick_close > tick_open and imbalance > BOOK_IMBALANCE_THRESHOLD:
+        return "BUY"
+    if price_close < price_open and tick_close < tick_open and imbalance < -BOOK_IMBALANCE_THRESHOLD:
+        return "SELL"
+    return None
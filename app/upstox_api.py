@@ -1,13 +1,15 @@
 import os
-import requests
+import httpx
 from dotenv import load_dotenv
+from app import http_client
+from app.logging import log_error
 
 load_dotenv()
 
 ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN")
 
-def fetch_candle_data(instrument_key, unit, interval, to_date, from_date):
-    url = f"https://api.upstox.com/v3/historical-candle/{instrument_key}/{unit}/{interval}/{to_date}/{from_date}"
+async def fetch_candle_data(instrument_key, unit, interval, to_date, from_date):
+    url = f"/v3/historical-candle/{instrument_key}/{unit}/{interval}/{to_date}/{from_date}"
 
     headers = {
         "Accept": "application/json",
@@ -15,8 +17,23 @@ def fetch_candle_data(instrument_key, unit, interval, to_date, from_date):
     }
 
     try:
-        response = requests.get(url, headers=headers)
-        return response.json() if response.ok else None
-    except Exception as e:
-        print(f"Error fetching candle data: {e}")
+        response = await http_client.get(url, headers=headers)
+        return response.json() if response.is_success else None
+    except (httpx.HTTPError, ValueError) as e:
+        log_error("Error fetching candle data: %s", e)
+        return None
+
+async def fetch_intraday_candle_data(instrument_key, unit, interval):
+    url = f"/v3/historical-candle/intraday/{instrument_key}/{unit}/{interval}"
+
+    headers = {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {ACCESS_TOKEN}"
+    }
+
+    try:
+        response = await http_client.get(url, headers=headers)
+        return response.json() if response.is_success else None
+    except (httpx.HTTPError, ValueError) as e:
+        log_error("Error fetching intraday candle data: %s", e)
         return None
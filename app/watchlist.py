@@ -0,0 +1,126 @@
+"""
+Many instruments over one client websocket, /ws/watchlist.
+
+The client manages its instruments with JSON commands at any time:
+
+    {"action": "subscribe", "instruments": ["NSE_EQ|INE002A01018", ...]}
+    {"action": "unsubscribe", "instruments": [...]}
+
+Each is answered with {"type": "subscribed", "instruments": {key: slot}},
+{"type": "unsubscribed", "instruments": [...]} or {"type": "error",
+"message": ...}. Newly subscribed instruments are followed by their latest
+stored candle, so a dashboard fills in without waiting for the next minute.
+
+All of a socket's instruments share one ClientChannel (coalescing by
+default), and the sender drains everything pending into one message, see
+wire.encode_json_batch and wire.encode_binary_slots. The binary slot of an
+instrument is stable while it stays subscribed.
+
+Commands are applied under Watchlist.lock, which the sender also takes, so
+no update of an instrument goes out before the reply that announces its
+slot, and a stored candle queued on subscribe precedes the live updates.
+"""
+import asyncio
+import json
+import os
+from app.wire import FORMAT_BINARY, encode_binary_slots, encode_json_batch
+
+WATCHLIST_MAX_INSTRUMENTS = int(os.getenv("WATCHLIST_MAX_INSTRUMENTS", "1000"))
+# Updates pending per watched instrument before the queue policy applies
+WATCHLIST_QUEUE_PER_INSTRUMENT = int(os.getenv("WATCHLIST_QUEUE_PER_INSTRUMENT", "4"))
+WATCHLIST_MAX_BATCH = 4096
+
+SUBSCRIBE = "subscribe"
+UNSUBSCRIBE = "unsubscribe"
+ACTIONS = (SUBSCRIBE, UNSUBSCRIBE)
+
+
+def parse_command(text):
+    """
+    Validates one client command.
+
+    Returns:
+        tuple: (action, instrument_keys)
+
+    Raises:
+        ValueError: With a message for the client
+    """
+    try:
+        command = json.loads(text)
+    except ValueError:
+        raise ValueError("commands must be JSON")
+    if not isinstance(command, dict) or command.get("action") not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+    instrument_keys = command.get("instruments")
+    if not isinstance(instrument_keys, list) or not all(isinstance(key, str) and key for key in instrument_keys):
+        raise ValueError("instruments must be a list of instrument keys")
+    return command["action"], list(dict.fromkeys(instrument_keys))
+
+
+class Watchlist:
+    """
+    The instruments one socket watches and their binary slots.
+    """
+
+    def __init__(self, max_instruments=WATCHLIST_MAX_INSTRUMENTS):
+        self.max_instruments = max_instruments
+        self.slots = {}
+        self.lock = asyncio.Lock()
+        self._free = []
+        self._next_slot = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, instrument_keys):
+        """
+        Assigns slots to the instruments not yet watched.
+
+        Returns:
+            dict: instrument_key -> slot for the newly added ones
+
+        Raises:
+            ValueError: If the watchlist would exceed max_instruments
+        """
+        added = [key for key in instrument_keys if key not in self.slots]
+        if len(self.slots) + len(added) > self.max_instruments:
+            raise ValueError(f"at most {self.max_instruments} instruments per socket")
+        assigned = {}
+        for instrument_key in added:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = self._next_slot
+                self._next_slot += 1
+            self.slots[instrument_key] = assigned[instrument_key] = slot
+        return assigned
+
+    def remove(self, instrument_keys):
+        """
+        Releases the slots of watched instruments.
+
+        Returns:
+            list: The instruments that were watched
+        """
+        removed = []
+        for instrument_key in instrument_keys:
+            slot = self.slots.pop(instrument_key, None)
+            if slot is not None:
+                self._free.append(slot)
+                removed.append(instrument_key)
+        return removed
+
+    def encode(self, updates, format):
+        """
+        One message for a batch of updates, skipping instruments unsubscribed
+        while their updates were pending.
+
+        Returns:
+            str, bytes or None: None when nothing is left to send
+        """
+        updates = [update for update in updates if update.instrument_key in self.slots]
+        if not updates:
+            return None
+        if format == FORMAT_BINARY:
+            return encode_binary_slots(updates, self.slots)
+        return encode_json_batch(updates)
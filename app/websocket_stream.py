@@ -1,53 +1,91 @@
-import asyncio
 import json
 import ssl
+import time
 import websockets
-import requests
 import os
 from dotenv import load_dotenv
-from fastapi import WebSocket
-from google.protobuf.json_format import MessageToDict
+from app import http_client
+from app.logging import log_error
 import app.MarketDataFeed_pb2 as pb
-from app.redis import redisClient
-from starlette.websockets import WebSocketDisconnect
-from app.trade_signal_logic import compute_cvd_ohlc
+from app.depth import DEPTH_ENABLED, InstrumentDepth
+from app.resample import RESAMPLE_TIMEFRAMES, CandleResampler
+from app.signal_engine import DEFAULT_STRATEGY
 
 load_dotenv()
 
 UPSTOX_ACCESS_TOKEN = os.getenv('UPSTOX_ACCESS_TOKEN')
 
-def get_market_data_feed_authorize_v3():
+AUTHORIZE_TTL = float(os.getenv("UPSTOX_AUTHORIZE_TTL", "60"))
+
+_authorized_uri = None
+_authorized_until = 0.0
+
+async def get_market_data_feed_authorize_v3():
     headers = {
         'Accept': 'application/json',
         'Authorization': f'Bearer {UPSTOX_ACCESS_TOKEN}'
     }
-    url = 'https://api.upstox.com/v3/feed/market-data-feed/authorize'
-    resp = requests.get(url=url, headers=headers)
+    url = '/v3/feed/market-data-feed/authorize'
+    resp = await http_client.get(url, headers=headers)
     return resp.json()
 
+async def get_authorized_feed_uri():
+    """
+    Returns the authorized feed URI, re-authorizing once the cached one expires.
+
+    Returns:
+        str or None: The websocket URI, or None if authorization failed
+    """
+    global _authorized_uri, _authorized_until
+    if _authorized_uri is not None and time.monotonic() < _authorized_until:
+        return _authorized_uri
+
+    response = await get_market_data_feed_authorize_v3()
+    if "data" not in response or "authorized_redirect_uri" not in response["data"]:
+        log_error("Failed to get WebSocket URI: %s", response)
+        return None
+
+    _authorized_uri = response["data"]["authorized_redirect_uri"]
+    _authorized_until = time.monotonic() + AUTHORIZE_TTL
+    return _authorized_uri
+
+def invalidate_authorized_feed_uri():
+    """
+    Drops the cached URI, e.g. after the upstream rejected it.
+    """
+    global _authorized_uri
+    _authorized_uri = None
+
+def connect_market_feed(uri):
+    """
+    Opens the upstream Upstox websocket for an authorized redirect URI.
+    """
+    if not uri.startswith("wss://"):
+        # Plain ws:// is only used against a local fake feed
+        return websockets.connect(uri, max_size=None)
+    ssl_context = ssl.create_default_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return websockets.connect(uri, ssl=ssl_context)
+
+def build_subscription(method, instrument_keys):
+    """
+    Builds a sub/unsub request for the upstream feed.
+    """
+    return json.dumps({
+        "guid": "someguid",
+        "method": method,
+        "data": {
+            "mode": "full",
+            "instrumentKeys": list(instrument_keys)
+        }
+    }).encode("utf-8")
 
 def decode_protobuf(buffer):
     feed_response = pb.FeedResponse()
     feed_response.ParseFromString(buffer)
     return feed_response
 
-def extract_market_minute_data(data_dict, instrument_key):
-    """
-    Extracts the minute data and timestamp from the decoded protobuf dict.
-    Returns (market_minute_data, ts_ms) or (None, None) if not found.
-    """
-    feed = data_dict.get("feeds", {}).get(instrument_key, {})
-    market_ff = feed.get("ff", {}).get("marketFF", {})
-    market_ohlc = market_ff.get("marketOHLC", {}).get("ohlc", [])
-    if not market_ohlc or len(market_ohlc) < 2:
-        return None, None
-    market_minute_data = market_ohlc[1]
-    try:
-        ts_ms = int(market_minute_data["ts"])
-    except Exception:
-        return None, None
-    return market_minute_data, ts_ms
-
 def build_payload(ts_sec, price_data, volume_data):
     """
     Builds the payload dict for sending to the client.
@@ -72,134 +110,97 @@ def build_payload(ts_sec, price_data, volume_data):
         "volume": volume_payload
     }
 
-def update_redis(redisClient, instrument_key, ts_sec, price_payload=None, volume_payload=None, alert_payload=None):
-    price_key = f"{instrument_key}:price"
-    volume_key = f"{instrument_key}:volume"
-    timestamp_key = f"{instrument_key}:timestamp"
-    alert_key = f"{instrument_key}:alerts"
-
-    if redisClient.sadd(timestamp_key, ts_sec):
-        redisClient.rpush(price_key, json.dumps(price_payload))
-        redisClient.rpush(volume_key, json.dumps(volume_payload))
-    if alert_payload:
-        redisClient.sadd(alert_key, json.dumps({
-            "time": ts_sec,
-            **alert_payload
-        }))
-
-async def fetch_market_data(instrument_keys, client_websocket: WebSocket):
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
+class InstrumentState:
+    """
+    Running per-instrument state carried between minute candles.
 
-    response = get_market_data_feed_authorize_v3()
-    if "data" not in response or "authorized_redirect_uri" not in response["data"]:
-        print("Failed to get WebSocket URI:", response)
-        return
-
-    uri = response["data"]["authorized_redirect_uri"]
-
-    async with websockets.connect(uri, ssl=ssl_context) as websocket:
-        await asyncio.sleep(1)
-        sub_data = {
-            "guid": "someguid",
-            "method": "sub",
-            "data": {
-                "mode": "full",
-                "instrumentKeys": instrument_keys
-            }
+    While a gap is being backfilled, live candles are parked in `backlog`
+    so the signal state still sees every candle in time order. `depth`
+    aggregates the book and trades between candles (None unless the
+    strategy needs_depth or DEPTH_ENABLED=1), and `resamplers` build the
+    higher-timeframe candles.
+    """
+    __slots__ = ("last_received_ts_ms", "signals", "backlog", "depth", "resamplers")
+
+    def __init__(self, strategy=DEFAULT_STRATEGY):
+        self.last_received_ts_ms = None
+        self.signals = strategy.new_state()
+        self.backlog = None
+        self.depth = InstrumentDepth() if DEPTH_ENABLED or strategy.needs_depth else None
+        self.resamplers = [CandleResampler(timeframe) for timeframe in RESAMPLE_TIMEFRAMES]
+
+def process_minute_candle(state, candle):
+    """
+    Runs the indicator/signal logic for one minute candle of one instrument.
+
+    Args:
+        state (InstrumentState): Running state for the instrument, updated in place
+        candle (tuple): (ts_ms, open, high, low, close, volume) as yielded by extract_minute_candles
+
+    Returns:
+        dict or None: The client payload, or None if the candle was already seen
+    """
+    ts_ms, price_open, price_high, price_low, price_close, _ = candle
+    if state.last_received_ts_ms is not None and ts_ms == state.last_received_ts_ms:
+        return None
+    state.last_received_ts_ms = ts_ms
+
+    features = state.depth.take_window() if state.depth is not None else None
+    values, signal = state.signals.update(candle, features)
+    cvd_open, cvd_high, cvd_low, cvd_close = values["cvd"]
+
+    price_data = {
+        "open": price_open,
+        "high": price_high,
+        "low": price_low,
+        "close": price_close
+    }
+
+    volume_data = {
+        "open": cvd_open,
+        "high": cvd_high,
+        "low": cvd_low,
+        "close": cvd_close
+    }
+
+    payload = build_payload(ts_ms // 1000, price_data, volume_data)
+    if signal:
+        payload["alert"] = {
+            "signal": signal,
+            "text": "buy" if signal == "BUY" else "sell"
         }
-        await websocket.send(json.dumps(sub_data).encode("utf-8"))
-
-        instrument_key = instrument_keys[0]
-        last_received_ts_ms = None 
-        prev_candle_volume = None
-        prev_cum = 0.0
-
-        prev_price_close = None
-        prev_cvd_close = None
-
-        while True:
-            try:
-                msg = await websocket.recv()
-                decoded = decode_protobuf(msg)
-                data_dict = MessageToDict(decoded)
-                # print('-----------------------------------------------------------')
-                # print(data_dict)
-                # print('-----------------------------------------------------------')
-
-                market_minute_data, ts_ms = extract_market_minute_data(data_dict, instrument_key)
-                if market_minute_data is None or ts_ms is None:
-                    continue
-
-                if last_received_ts_ms is not None and ts_ms == last_received_ts_ms:
-                    continue
-                last_received_ts_ms = ts_ms
-
-                ts_sec = ts_ms // 1000
-                price_open = float(market_minute_data["open"])
-                price_high = float(market_minute_data["high"])
-                price_low  = float(market_minute_data["low"])
-                price_close= float(market_minute_data["close"])
-                current_candle_volume = float(market_minute_data.get("volume", 0.0))
-
-                if prev_candle_volume is None:
-                    prev_candle_volume = current_candle_volume
-
-                # vol_open = prev_candle_volume
-                # vol_close = current_candle_volume
-                # vol_high = max(vol_open, vol_close)
-                # vol_low  = min(vol_open, vol_close)
-
-                cvd_open, cvd_high, cvd_low, cvd_close, prev_cum = compute_cvd_ohlc(price_open, price_close, current_candle_volume, prev_cum)
-
-                signal = None
-                if prev_price_close is not None and prev_cvd_close is not None:
-                    # Bullish engulfing style
-                    if price_close > price_open and cvd_close > cvd_open and cvd_close > prev_cvd_close:
-                        signal = "BUY"
-                    # Bearish engulfing style
-                    elif price_close < price_open and cvd_close < cvd_open and cvd_close < prev_cvd_close:
-                        signal = "SELL"
-
-                prev_price_close = price_close
-                prev_cvd_close = cvd_close
-                
-                price_data = {
-                    "open": price_open,
-                    "high": price_high,
-                    "low": price_low,
-                    "close": price_close
-                }
-
-                volume_data = {
-                    "open": cvd_open,
-                    "high": cvd_high,
-                    "low": cvd_low,
-                    "close": cvd_close
-                }
-
-                payload = build_payload(ts_sec, price_data, volume_data)
-                if signal:
-                    payload["alert"] = {
-                        "signal": signal,
-                        "text": "buy" if signal == "BUY" else "sell"
-                    } 
-
-                else:
-                    payload["alert"] = None
-
-                update_redis(redisClient, instrument_key, ts_sec, payload["price"], payload["volume"], payload["alert"])
-
-                try:
-                    await client_websocket.send_json(payload)
-                    prev_candle_volume = current_candle_volume
-                except WebSocketDisconnect:
-                    print("Client disconnected, stopping stream")
-                    break
-                except RuntimeError as e:
-                    print(f"Client websocket already closed: {e}")
-                    break
-
-            except Exception as e:
-                print(f"Error in sending message", e)
+    else:
+        payload["alert"] = None
+
+    return payload
+
+def extract_minute_candles(feed_response, instrument_keys=None):
+    """
+    Reads the 1-minute candle of every instrument in a decoded FeedResponse.
+
+    Fields are read straight off the message objects, so only the six values
+    the signal logic needs are ever materialized.
+
+    Args:
+        feed_response (FeedResponse): The decoded upstream frame
+        instrument_keys (container or None): Restrict to these instruments, or None for all
+
+    Yields:
+        tuple: (instrument_key, (ts_ms, open, high, low, close, volume))
+    """
+    for instrument_key, feed in feed_response.feeds.items():
+        if instrument_keys is not None and instrument_key not in instrument_keys:
+            continue
+        if not feed.HasField("ff"):
+            continue
+        full_feed = feed.ff
+        if not full_feed.HasField("marketFF"):
+            continue
+        market_ohlc = full_feed.marketFF.marketOHLC.ohlc
+        if len(market_ohlc) < 2:
+            continue
+        minute = market_ohlc[1]
+        ts_ms = minute.ts
+        if not ts_ms:
+            continue
+        yield instrument_key, (ts_ms, minute.open, minute.high, minute.low, minute.close, float(minute.volume))
@@ -0,0 +1,124 @@
+"""
+Wire encodings for live updates sent to browser clients.
+
+Clients pick one with ?format= on the live websocket:
+
+- json (default): one text message per update, the build_payload dict plus "alert"
+  (and "timeframe" for resampled candles, see app.resample)
+- binary: one binary message per batch of updates, little-endian:
+
+      header  u8 version (=1), u8 reserved, u16 count
+      record  i64 time, f64 price open/high/low/close, f64 cvd open/high/low/close,
+              u8 signal (0 none, 1 BUY, 2 SELL)            -- 73 bytes each
+
+liveChart.js decodes both.
+
+The multi-instrument /ws/watchlist socket (see app.watchlist) sends all of
+a client's pending updates, typically everything one upstream frame
+produced, as a single message instead:
+
+- json: {"type": "updates", "updates": [[instrument_key, payload], ...]}
+- binary: the frame above with version 2 and each record prefixed by the
+  instrument's u16 slot, as assigned in the socket's "subscribed" reply
+  -- 75 bytes each
+"""
+import json
+import struct
+from app.resample import BASE_TIMEFRAME
+
+WIRE_VERSION = 1
+WATCHLIST_WIRE_VERSION = 2
+FRAME_HEADER = struct.Struct("<BBH")
+RECORD = struct.Struct("<q8dB")
+SLOT = struct.Struct("<H")
+MAX_BATCH = 64
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+FORMATS = (FORMAT_JSON, FORMAT_BINARY)
+
+SIGNAL_CODES = {None: 0, "BUY": 1, "SELL": 2}
+
+
+class Update:
+    """
+    One processed candle on its way to clients, encoded at most once per format
+    no matter how many clients receive it.
+    """
+    __slots__ = ("instrument_key", "payload", "timeframe", "_json", "_record", "_entry")
+
+    def __init__(self, instrument_key, payload, timeframe=BASE_TIMEFRAME):
+        self.instrument_key = instrument_key
+        self.payload = payload
+        self.timeframe = timeframe
+        self._json = None
+        self._record = None
+        self._entry = None
+
+    @classmethod
+    def from_json(cls, instrument_key, text):
+        """
+        Rebuilds an update published as JSON, keeping the text for JSON clients.
+        """
+        payload = json.loads(text)
+        update = cls(instrument_key, payload, payload.get("timeframe", BASE_TIMEFRAME))
+        update._json = text
+        return update
+
+    @property
+    def key(self):
+        return self.instrument_key, self.timeframe, self.payload["time"]
+
+    def json(self):
+        if self._json is None:
+            self._json = json.dumps(self.payload)
+        return self._json
+
+    def record(self):
+        if self._record is None:
+            self._record = pack_record(self.payload)
+        return self._record
+
+    def entry(self):
+        """
+        The update as a JSON [instrument_key, payload] pair, for batched messages.
+        """
+        if self._entry is None:
+            self._entry = f"[{json.dumps(self.instrument_key)}, {self.json()}]"
+        return self._entry
+
+
+def pack_record(payload):
+    price = payload["price"]
+    volume = payload["volume"]
+    alert = payload.get("alert")
+    return RECORD.pack(
+        payload["time"],
+        price["open"], price["high"], price["low"], price["close"],
+        volume["open"], volume["high"], volume["low"], volume["close"],
+        SIGNAL_CODES[alert["signal"] if alert else None],
+    )
+
+
+def encode_binary(updates):
+    """
+    Packs a batch of updates into one binary frame.
+    """
+    return FRAME_HEADER.pack(WIRE_VERSION, 0, len(updates)) + b"".join(update.record() for update in updates)
+
+
+def encode_json_batch(updates):
+    """
+    Packs updates of several instruments into one JSON text message.
+    """
+    return '{"type": "updates", "updates": [' + ", ".join(update.entry() for update in updates) + "]}"
+
+
+def encode_binary_slots(updates, slots):
+    """
+    Packs updates of several instruments into one binary frame, each record
+    prefixed with the instrument's slot from `slots` (instrument_key -> int).
+    """
+    return FRAME_HEADER.pack(WATCHLIST_WIRE_VERSION, 0, len(updates)) + b"".join(
+        SLOT.pack(slots[update.instrument_key]) + update.record() for update in updates
+    )
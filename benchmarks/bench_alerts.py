@@ -0,0 +1,91 @@
+"""
+Throughput and latency of the alert pipeline: deduplicating publish into the
+Redis Stream, then consumer-group delivery to in-memory stub sinks.
+
+Needs a Redis server reachable with the app's REDIS_HOST/REDIS_PORT. Uses its
+own stream and deletes it afterwards. Run from the repository root:
+
+    python -m benchmarks.bench_alerts --alerts 20000 --duplicates 0.5 --consumers 4
+    python -m benchmarks.bench_alerts --alerts 5000 --fail-rate 0.2
+"""
+import argparse
+import asyncio
+import random
+import time
+import numpy as np
+from app.alerts import AlertDispatcher, AlertQueue, StubSink
+from app.redis import redisClient
+from app.redis_writer import RedisBatchWriter
+
+STREAM = "bench:alerts"
+
+
+async def run(args):
+    rng = random.Random(3)
+    instruments = [f"NSE_EQ|BENCH{i:04d}" for i in range(args.instruments)]
+    await redisClient.delete(STREAM, *(f"{key}:alert_index" for key in instruments))
+
+    writer = RedisBatchWriter(redisClient)
+    queue = AlertQueue(writer, stream=STREAM)
+    sink = StubSink(fail_rate=args.fail_rate)
+    dispatchers = [
+        AlertDispatcher(redisClient, sink, stream=STREAM, batch_size=args.batch, block_ms=100,
+                        backoff=0.01, claim_idle_ms=500)
+        for _ in range(args.consumers)
+    ]
+    tasks = [asyncio.create_task(dispatcher.run()) for dispatcher in dispatchers]
+
+    # Each new alert is followed by a repeat of an earlier one with probability `duplicates`
+    published, unique = [], set()
+    started = time.perf_counter()
+    while len(published) < args.alerts:
+        if published and rng.random() < args.duplicates:
+            alert = rng.choice(published)
+        else:
+            alert = (rng.choice(instruments), 60 * len(published), rng.choice(("BUY", "SELL")))
+            unique.add(alert)
+        published.append(alert)
+        instrument_key, ts_sec, signal = alert
+        queue.publish(instrument_key, ts_sec, {"signal": signal, "text": signal.lower()})
+        if len(published) % args.rate_batch == 0:
+            await asyncio.sleep(0)
+    await writer.flush()
+    publish_elapsed = time.perf_counter() - started
+
+    deadline = time.monotonic() + args.timeout
+    while len(sink.received) < len(unique) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    for task in tasks:
+        task.cancel()
+    await writer.close()
+    stream_len = await redisClient.xlen(STREAM)
+    await redisClient.delete(STREAM, *(f"{key}:alert_index" for key in instruments))
+
+    delivered = {(alert["instrument"], alert["time"], alert["signal"]) for _, alert in sink.received}
+    print(f"published {len(published)} alerts ({len(unique)} unique) in {publish_elapsed:.2f}s, "
+          f"{len(published) / publish_elapsed:.0f}/s; stream holds {stream_len}")
+    print(f"delivered {len(sink.received)} ({len(delivered)} unique, {len(unique - delivered)} missing) "
+          f"in {elapsed:.2f}s, {len(sink.received) / elapsed:.0f}/s with {args.consumers} consumers")
+    if sink.received:
+        ms = np.asarray([received_at - alert["created_at"] for received_at, alert in sink.received]) * 1e3
+        print("delivery latency ms: " + "  ".join(f"p{p} {np.percentile(ms, p):.1f}" for p in (50, 90, 99)) + f"  max {ms.max():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=10000)
+    parser.add_argument("--instruments", type=int, default=100)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of publishes that repeat an earlier alert")
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of sink batches that fail and are retried")
+    parser.add_argument("--rate-batch", type=int, default=500, help="publishes between event-loop yields")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Times the vectorized backtest on synthetic minute candles and checks it
+against the live per-tick logic.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_backtest --candles 1000000
+"""
+import argparse
+import time
+import numpy as np
+from app.backtest import COLUMNS, live_signals, run_backtest
+from benchmarks.bench_indicators import synthetic_series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candles", type=int, default=1_000_000)
+    parser.add_argument("--verify-candles", type=int, default=50_000)
+    args = parser.parse_args()
+
+    for strategy in ("cvd_engulfing", "ema_cross_vwap"):
+        check = dict(zip(COLUMNS, synthetic_series(args.verify_candles, seed=1)))
+        signals, _ = run_backtest(check, strategy)
+        assert np.array_equal(signals, live_signals(check, strategy)), strategy
+
+        columns = dict(zip(COLUMNS, synthetic_series(args.candles, seed=2)))
+        start = time.perf_counter()
+        _, report = run_backtest(columns, strategy)
+        elapsed = time.perf_counter() - start
+        print(f"{strategy:15s} {args.candles} candles in {elapsed:.2f}s "
+              f"({report['signals']} signals, hit rate {report['hit_rate']:.3f}); "
+              f"matches live logic on {args.verify_candles} candles")
+
+
+if __name__ == "__main__":
+    main()
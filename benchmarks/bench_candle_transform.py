@@ -0,0 +1,90 @@
+"""
+Throughput of the /getCandleData candle transform at 10k, 100k and 1M candles.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_candle_transform
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from app.historical import transform_candles
+
+IST = timezone(timedelta(hours=5, minutes=30))
+UTC = timezone.utc
+
+
+def legacy_transform(candle_list, unit):
+    """
+    The previous per-candle loop from routes.fetch, kept for comparison.
+    """
+    candles = []
+    volumes = []
+    prev_volume = candle_list[0][5]
+    for candle in candle_list:
+        dt = datetime.fromisoformat(candle[0]).replace(tzinfo=UTC)
+        dt = dt.astimezone(IST)
+        if unit == "days":
+            time_value = dt.strftime("%Y-%m-%d")
+        else:
+            time_value = int(dt.timestamp())
+        candles.append({"time": time_value, "open": candle[1], "high": candle[2], "low": candle[3], "close": candle[4]})
+        current_volume = candle[5]
+        volumes.append({
+            "time": time_value,
+            "open": prev_volume,
+            "high": max(prev_volume, current_volume),
+            "low": min(prev_volume, current_volume),
+            "close": current_volume
+        })
+        prev_volume = current_volume
+        candles.sort(key=lambda x: x["time"])
+        volumes.sort(key=lambda x: x["time"])
+    return candles, volumes
+
+
+def synthetic_candles(count, unit, seed=11):
+    """
+    Newest-first candles shaped like the Upstox historical-candle response.
+    """
+    rng = random.Random(seed)
+    step = timedelta(days=1) if unit == "days" else timedelta(minutes=1)
+    start = datetime(2020, 1, 1, 9, 15, tzinfo=IST)
+    price = 1000.0
+    candles = []
+    for i in range(count):
+        price = max(1.0, price + rng.uniform(-2, 2))
+        ts = (start + i * step).isoformat()
+        candles.append([ts, price, price + 1, price - 1, price + 0.5, rng.randint(0, 100_000), 0])
+    candles.reverse()
+    return candles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="largest size to also time the quadratic legacy loop at")
+    args = parser.parse_args()
+
+    for unit in ("days", "minutes"):
+        check = synthetic_candles(2_000, unit)
+        assert transform_candles(check, unit) == legacy_transform(check, unit), unit
+
+    for size in args.sizes:
+        candle_list = synthetic_candles(size, "minutes")
+        start = time.perf_counter()
+        transform_candles(candle_list, "minutes")
+        elapsed = time.perf_counter() - start
+        line = f"{size:>9} candles  vectorized {elapsed:8.3f}s  {size / elapsed:12.0f} candles/s"
+        if size <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_transform(candle_list, "minutes")
+            legacy = time.perf_counter() - start
+            line += f"  legacy {legacy:8.3f}s ({legacy / elapsed:.0f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Compares the MessageToDict decode path against typed protobuf field access.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_decode --instruments 50 --frames 2000
+    python -m benchmarks.bench_decode --recording feed.rec
+"""
+import argparse
+import random
+import time
+from google.protobuf.json_format import MessageToDict
+import app.MarketDataFeed_pb2 as pb
+from app.feed_recorder import read_recording
+from app.websocket_stream import decode_protobuf, extract_minute_candles
+
+
+def build_full_feed_frame(instrument_keys, ts_ms, rng):
+    """
+    Builds a full-mode FeedResponse frame resembling what Upstox sends.
+    """
+    response = pb.FeedResponse(type=pb.live_feed, currentTs=ts_ms)
+    for instrument_key in instrument_keys:
+        price = rng.uniform(100, 3000)
+        market_ff = response.feeds[instrument_key].ff.marketFF
+        market_ff.ltpc.ltp = price
+        market_ff.ltpc.ltt = ts_ms
+        market_ff.ltpc.ltq = rng.randint(1, 500)
+        market_ff.ltpc.cp = price * 0.99
+        for level in range(5):
+            quote = market_ff.marketLevel.bidAskQuote.add()
+            quote.bidQ = rng.randint(1, 5000)
+            quote.bp = price - 0.05 * (level + 1)
+            quote.bno = rng.randint(1, 50)
+            quote.askQ = rng.randint(1, 5000)
+            quote.ap = price + 0.05 * (level + 1)
+            quote.ano = rng.randint(1, 50)
+        for interval, ts in (("1d", ts_ms - ts_ms % 86_400_000), ("I1", ts_ms - ts_ms % 60_000)):
+            ohlc = market_ff.marketOHLC.ohlc.add()
+            ohlc.interval = interval
+            ohlc.open = price
+            ohlc.high = price * 1.01
+            ohlc.low = price * 0.99
+            ohlc.close = price * 1.002
+            ohlc.volume = rng.randint(1, 100_000)
+            ohlc.ts = ts
+        details = market_ff.eFeedDetails
+        details.atp = price
+        details.vtt = rng.randint(1, 10_000_000)
+        details.tbq = rng.uniform(1, 1e6)
+        details.tsq = rng.uniform(1, 1e6)
+    return response.SerializeToString()
+
+
+def legacy_decode(msg, instrument_keys):
+    """
+    The previous path: MessageToDict followed by string-keyed lookups.
+    """
+    data_dict = MessageToDict(decode_protobuf(msg))
+    candles = []
+    for instrument_key in instrument_keys:
+        feed = data_dict.get("feeds", {}).get(instrument_key, {})
+        market_ohlc = feed.get("ff", {}).get("marketFF", {}).get("marketOHLC", {}).get("ohlc", [])
+        if len(market_ohlc) < 2:
+            continue
+        minute = market_ohlc[1]
+        candles.append((instrument_key, (
+            int(minute["ts"]),
+            float(minute["open"]),
+            float(minute["high"]),
+            float(minute["low"]),
+            float(minute["close"]),
+            float(minute.get("volume", 0.0)),
+        )))
+    return candles
+
+
+def typed_decode(msg, instrument_keys):
+    return list(extract_minute_candles(decode_protobuf(msg), instrument_keys))
+
+
+def time_path(decode, frames, instrument_keys):
+    start = time.perf_counter()
+    for msg in frames:
+        decode(msg, instrument_keys)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instruments", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--recording", help="frames recorded via FEED_RECORD_PATH instead of synthetic ones")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = [frame for _, frame in read_recording(args.recording)]
+        instrument_keys = sorted({key for frame in frames for key in decode_protobuf(frame).feeds})
+    else:
+        rng = random.Random(args.seed)
+        instrument_keys = [f"NSE_EQ|BENCH{i:04d}" for i in range(args.instruments)]
+        frames = [build_full_feed_frame(instrument_keys, 1_700_000_000_000 + i * 1000, rng) for i in range(args.frames)]
+    wanted = set(instrument_keys)
+
+    for msg in frames[:50]:
+        assert sorted(legacy_decode(msg, instrument_keys)) == sorted(typed_decode(msg, wanted))
+
+    legacy = time_path(legacy_decode, frames, instrument_keys)
+    typed = time_path(typed_decode, frames, wanted)
+    ticks = sum(len(typed_decode(msg, wanted)) for msg in frames)
+
+    print(f"{len(frames)} frames, {len(instrument_keys)} instruments, {sum(map(len, frames)) / len(frames):.0f} bytes/frame")
+    print(f"MessageToDict : {legacy:8.3f}s  {ticks / legacy:12.0f} candles/s")
+    print(f"typed access  : {typed:8.3f}s  {ticks / typed:12.0f} candles/s  ({legacy / typed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost and footprint of the order-book/tick aggregator (app.depth) on
+synthetic full-mode frames with a random-walk price, a moving book and a
+monotonic day volume. Run from the repository root:
+
+    python -m benchmarks.bench_depth --instruments 500 --frames 2000
+"""
+import argparse
+import random
+import time
+import numpy as np
+import app.MarketDataFeed_pb2 as pb
+from app.depth import InstrumentDepth, update_depth
+from app.websocket_stream import decode_protobuf
+
+
+class Holder:
+    __slots__ = ("depth",)
+
+    def __init__(self):
+        self.depth = InstrumentDepth()
+
+
+def build_frames(instrument_keys, count, rng):
+    prices = {key: rng.uniform(100, 3000) for key in instrument_keys}
+    volumes = dict.fromkeys(instrument_keys, 0)
+    frames = []
+    ts_ms = 1_700_000_000_000
+    for _ in range(count):
+        ts_ms += 250
+        response = pb.FeedResponse(type=pb.live_feed, currentTs=ts_ms)
+        for key in instrument_keys:
+            price = prices[key] = max(1.0, prices[key] + rng.choice((-0.05, 0.0, 0.05)))
+            traded = rng.randint(0, 300)
+            volumes[key] += traded
+            market_ff = response.feeds[key].ff.marketFF
+            market_ff.ltpc.ltp = price + rng.choice((-0.05, 0.05))
+            market_ff.ltpc.ltt = ts_ms if traded else ts_ms - 250
+            market_ff.ltpc.ltq = max(traded, 1)
+            for level in range(5):
+                quote = market_ff.marketLevel.bidAskQuote.add()
+                quote.bp = price - 0.05 * (level + 1)
+                quote.bidQ = rng.randint(1, 5000)
+                quote.ap = price + 0.05 * (level + 1)
+                quote.askQ = rng.randint(1, 5000)
+            market_ff.eFeedDetails.vtt = volumes[key]
+            market_ff.eFeedDetails.tbq = rng.uniform(1, 1e6)
+            market_ff.eFeedDetails.tsq = rng.uniform(1, 1e6)
+        frames.append(response.SerializeToString())
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instruments", type=int, default=100)
+    parser.add_argument("--frames", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    instrument_keys = [f"NSE_EQ|BENCH{i:04d}" for i in range(args.instruments)]
+    responses = [decode_protobuf(frame) for frame in build_frames(instrument_keys, args.frames, rng)]
+    states = {key: Holder() for key in instrument_keys}
+
+    started = time.perf_counter()
+    for response in responses:
+        update_depth(response, states)
+    elapsed = time.perf_counter() - started
+
+    updates = args.instruments * args.frames
+    depth = states[instrument_keys[0]].depth
+    footprint = depth.book.nbytes + depth.stats.nbytes + depth.history.nbytes
+    print(f"{args.frames} frames x {args.instruments} instruments: {elapsed / args.frames * 1e3:.2f} ms/frame, "
+          f"{elapsed / updates * 1e6:.2f} us/instrument update")
+    print(f"array footprint {footprint / 1024:.1f} KiB per instrument, "
+          f"{footprint * args.instruments / 2**20:.1f} MiB for {args.instruments}")
+    series = depth.series()
+    print(f"last {len(series['ts_ms'])} frames of {instrument_keys[0]}: "
+          f"tick CVD {series['tick_cvd'][-1]:.0f}, mean book imbalance {np.nanmean(series['imbalance']):+.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Checks incremental indicators against their batch references and measures
+per-tick latency of the signal engine across many instruments.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_indicators --instruments 1000 --ticks 200
+"""
+import argparse
+import time
+import numpy as np
+from app import indicators
+from app.signal_engine import STRATEGIES
+
+
+def synthetic_series(count, seed):
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.normal(0, 1, count))
+    price_open = np.r_[close[0], close[:-1]] + rng.normal(0, 0.2, count)
+    high = np.maximum(price_open, close) + rng.uniform(0, 1, count)
+    low = np.minimum(price_open, close) - rng.uniform(0, 1, count)
+    volume = rng.integers(0, 50_000, count).astype(float)
+    # Minute candles spanning several IST sessions
+    ts_ms = 1_700_000_000_000 + np.arange(count, dtype=np.int64) * 60_000 * 7
+    return ts_ms, price_open, high, low, close, volume
+
+
+def check_against_batch(count=5_000, seed=3):
+    ts_ms, price_open, high, low, close, volume = synthetic_series(count, seed)
+    candles = list(zip(ts_ms.tolist(), price_open.tolist(), high.tolist(), low.tolist(), close.tolist(), volume.tolist()))
+
+    def run(indicator):
+        return np.array([indicator.update(candle) for candle in candles], dtype=float)
+
+    pairs = {
+        "ema": (run(indicators.EMA(20)), indicators.ema_batch(close, 20)),
+        "vwap": (run(indicators.VWAP()), indicators.vwap_batch(ts_ms, high, low, close, volume)),
+        "rsi": (run(indicators.RSI(14)), indicators.rsi_batch(close, 14)),
+        "atr": (run(indicators.ATR(14)), indicators.atr_batch(high, low, close, 14)),
+        "cvd": (run(indicators.CVD()), np.column_stack(indicators.cvd_batch(price_open, close, volume))),
+        "rolling_cvd": (run(indicators.RollingCVD(30)), indicators.rolling_cvd_batch(price_open, close, volume, 30)),
+    }
+    for name, (incremental, batch) in pairs.items():
+        assert np.array_equal(incremental, batch, equal_nan=True), name
+        print(f"{name:12s} incremental == batch over {count} candles")
+
+
+def bench_engine(strategy, instrument_count, ticks, seed=5):
+    ts_ms, price_open, high, low, close, volume = synthetic_series(ticks, seed)
+    rng = np.random.default_rng(seed)
+    offsets = rng.uniform(0.5, 2.0, instrument_count)
+    states = [strategy.new_state() for _ in range(instrument_count)]
+
+    latencies = np.empty(ticks)
+    for t in range(ticks):
+        base = (int(ts_ms[t]), price_open[t], high[t], low[t], close[t], volume[t])
+        tick_candles = [(base[0], base[1] * k, base[2] * k, base[3] * k, base[4] * k, base[5]) for k in offsets]
+        start = time.perf_counter()
+        for state, candle in zip(states, tick_candles):
+            state.update(candle)
+        latencies[t] = time.perf_counter() - start
+
+    per_tick = latencies * 1e3
+    per_update = latencies.sum() / (ticks * instrument_count) * 1e6
+    print(f"{strategy.name:15s} {instrument_count} instruments: "
+          f"p50 {np.percentile(per_tick, 50):.2f}ms  p99 {np.percentile(per_tick, 99):.2f}ms per tick, "
+          f"{per_update:.2f}us per instrument update")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instruments", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    check_against_batch()
+    for strategy in STRATEGIES.values():
+        bench_engine(strategy, args.instruments, args.ticks)
+
+
+if __name__ == "__main__":
+    main()
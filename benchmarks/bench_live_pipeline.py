@@ -0,0 +1,203 @@
+"""
+End-to-end load benchmark of the live pipeline against a fake Upstox feed.
+
+Starts benchmarks.fake_upstox in-process, runs the app under uvicorn in a
+subprocess pointed at it, opens N browser-style websockets and reports tick
+latency percentiles, throughput, app CPU use and per-stage time. Needs a
+Redis server reachable with the app's REDIS_HOST/REDIS_PORT.
+
+With --workers N it instead starts one ingestion worker (python -m app.ingest)
+and N web workers in FEED_MODE=redis on consecutive ports, spreads the
+clients across them and sums CPU and web-side stage time over all processes.
+
+    python -m benchmarks.bench_live_pipeline --clients 100 --instruments 50 --rate 20 --duration 30
+    python -m benchmarks.bench_live_pipeline --clients 400 --instruments 50 --workers 4
+    python -m benchmarks.bench_live_pipeline --clients 20 --replay feed.rec --speed 50 \
+        --replay-instruments "NSE_EQ|INE002A01018" --format binary
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+import numpy as np
+import uvicorn
+import websockets
+from app.wire import FRAME_HEADER, RECORD
+from benchmarks.fake_upstox import FakeUpstox
+
+STAGES = (
+    ("decode", "feed_decode_seconds"),
+    ("depth", "feed_depth_seconds"),
+    ("compute", "feed_compute_seconds"),
+    ("store", "feed_store_seconds"),
+    ("redis flush", "redis_flush_seconds"),
+    ("fan-out", "feed_fanout_seconds"),
+    ("client send", "client_send_seconds"),
+)
+
+
+def process_cpu_seconds(pid):
+    """
+    User + system CPU seconds of a process, from /proc (Linux only).
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def wait_for_http(url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def fetch_stats(app_urls):
+    """
+    /stats of every web worker, with histograms summed across them.
+    """
+    totals = {}
+    async with httpx.AsyncClient() as client:
+        for app_url in app_urls:
+            for name, value in (await client.get(f"{app_url}/stats")).json().items():
+                if isinstance(value, dict) and "count" in value:
+                    total = totals.setdefault(name, {"count": 0, "sum": 0.0})
+                    total["count"] += value["count"]
+                    total["sum"] += value["sum"]
+    return totals
+
+
+def tick_times(message):
+    """
+    Candle times carried by one JSON or binary live message.
+    """
+    if isinstance(message, str):
+        return [json.loads(message)["time"]]
+    _, _, count = FRAME_HEADER.unpack_from(message)
+    return [RECORD.unpack_from(message, FRAME_HEADER.size + i * RECORD.size)[0] for i in range(count)]
+
+
+async def run_client(url, fake, latencies, counts, stop):
+    async with websockets.connect(url, max_size=None) as ws:
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            received = time.time()
+            for tick_time in tick_times(message):
+                sent = fake.sent_at.get(tick_time)
+                if sent is not None:
+                    latencies.append(received - sent)
+                counts[0] += 1
+
+
+async def run(args):
+    fake = FakeUpstox(args.instruments, args.rate, args.replay, args.speed)
+    fake_server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=args.fake_port, log_level="warning"))
+    fake_task = asyncio.create_task(fake_server.serve())
+
+    env = dict(os.environ, UPSTOX_API_BASE=f"http://127.0.0.1:{args.fake_port}", UPSTOX_ACCESS_TOKEN="bench")
+    procs = []
+    ports = [args.app_port + i for i in range(max(args.workers, 1))]
+    if args.workers:
+        env["FEED_MODE"] = "redis"
+        procs.append(subprocess.Popen([sys.executable, "-m", "app.ingest"], env=env))
+    for port in ports:
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=env,
+        ))
+    app_urls = [f"http://127.0.0.1:{port}" for port in ports]
+    try:
+        for app_url in app_urls:
+            await wait_for_http(app_url + "/stats")
+        instrument_keys = fake.instrument_keys if args.replay is None else args.replay_instruments
+        latencies, counts, stop = [], [0], asyncio.Event()
+        clients = [
+            asyncio.create_task(run_client(
+                f"ws://127.0.0.1:{ports[i % len(ports)]}/ws/live/{instrument_keys[i % len(instrument_keys)]}?format={args.format}",
+                fake, latencies, counts, stop,
+            ))
+            for i in range(args.clients)
+        ]
+
+        # Let the app authorize and subscribe before measuring
+        await asyncio.sleep(args.warmup)
+        latencies.clear()
+        counts[0] = 0
+        frames_before = fake.frames_sent
+        stats_before = await fetch_stats(app_urls)
+        cpu_before = [process_cpu_seconds(proc.pid) for proc in procs]
+        started = time.perf_counter()
+
+        await asyncio.sleep(args.duration)
+
+        elapsed = time.perf_counter() - started
+        cpu_after = [process_cpu_seconds(proc.pid) for proc in procs]
+        stats_after = await fetch_stats(app_urls)
+        frames = fake.frames_sent - frames_before
+        stop.set()
+        await asyncio.gather(*clients, return_exceptions=True)
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+        fake_server.should_exit = True
+        await fake_task
+
+    print(f"{args.clients} clients, {frames / elapsed:.1f} frames/s upstream, "
+          f"{counts[0] / elapsed:.1f} ticks/s delivered to clients")
+    if latencies:
+        ms = np.asarray(latencies) * 1e3
+        print("tick latency ms: " + "  ".join(f"p{p} {np.percentile(ms, p):.2f}" for p in (50, 90, 99)) + f"  max {ms.max():.2f}")
+    if None not in cpu_before and None not in cpu_after:
+        shares = [(after - before) / elapsed * 100 for before, after in zip(cpu_before, cpu_after)]
+        print(f"app CPU: {sum(shares):.1f}% of one core (" + ", ".join(f"{share:.1f}%" for share in shares) + " per process)")
+    print("per-stage app time (share of wall clock):")
+    for label, name in STAGES:
+        before, after = stats_before.get(name), stats_after.get(name)
+        if not before or not after:
+            continue
+        spent = after["sum"] - before["sum"]
+        calls = after["count"] - before["count"]
+        if not calls:
+            continue
+        per_call = spent / calls * 1e6
+        print(f"  {label:12s} {spent / elapsed * 100:6.2f}%  {calls:8d} calls  {per_call:8.1f}us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--instruments", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=10.0, help="synthetic upstream frames per second")
+    parser.add_argument("--replay", help="recording written via FEED_RECORD_PATH")
+    parser.add_argument("--replay-instruments", nargs="+", default=[], help="instrument keys to watch when replaying")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--format", choices=("json", "binary"), default="json", help="client wire format")
+    parser.add_argument("--workers", type=int, default=0, help="web workers behind one ingestion worker (0: single local-mode app)")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    args = parser.parse_args()
+    if args.replay and not args.replay_instruments:
+        parser.error("--replay needs --replay-instruments")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Load benchmark of multi-instrument watchlist sockets (/ws/watchlist).
+
+Starts benchmarks.fake_upstox in-process with --instruments synthetic
+instruments, runs the app under uvicorn in a subprocess pointed at it, and
+opens --clients sockets that each subscribe to --per-client of them (all by
+default). Reports subscribe time, updates and messages delivered per second,
+update latency, app CPU use and per-stage time. Needs a Redis server
+reachable with the app's REDIS_HOST/REDIS_PORT.
+
+    python -m benchmarks.bench_watchlist --instruments 500 --clients 100 --rate 1 --duration 30
+    python -m benchmarks.bench_watchlist --instruments 500 --clients 100 --format json --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import uvicorn
+import websockets
+from app.wire import FRAME_HEADER
+from benchmarks.bench_live_pipeline import STAGES, fetch_stats, process_cpu_seconds, wait_for_http
+from benchmarks.fake_upstox import FakeUpstox
+
+SLOT_RECORD = np.dtype([("slot", "<u2"), ("time", "<i8"), ("values", "<f8", 8), ("signal", "u1")])
+
+
+def update_times(message):
+    """
+    Candle times of every update in one watchlist message, or None for a control reply.
+    """
+    if isinstance(message, str):
+        data = json.loads(message)
+        if data["type"] != "updates":
+            return None
+        return [payload["time"] for _, payload in data["updates"]]
+    _, _, count = FRAME_HEADER.unpack_from(message)
+    return np.frombuffer(message, SLOT_RECORD, count, FRAME_HEADER.size)["time"].tolist()
+
+
+async def run_client(url, instrument_keys, fake, stats, ready, stop):
+    async with websockets.connect(url, max_size=None) as ws:
+        started = time.perf_counter()
+        await ws.send(json.dumps({"action": "subscribe", "instruments": instrument_keys}))
+        while True:
+            reply = json.loads(await ws.recv())
+            if reply["type"] == "subscribed":
+                break
+        stats["subscribe"].append(time.perf_counter() - started)
+        ready.release()
+
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            received = time.time()
+            times = update_times(message)
+            if not times:
+                continue
+            stats["messages"] += 1
+            stats["updates"] += len(times)
+            stats["bytes"] += len(message)
+            sent = fake.sent_at.get(times[-1])
+            if sent is not None:
+                stats["latencies"].append(received - sent)
+
+
+async def run(args):
+    fake = FakeUpstox(args.instruments, args.rate)
+    fake_server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=args.fake_port, log_level="warning"))
+    fake_task = asyncio.create_task(fake_server.serve())
+
+    env = dict(os.environ, UPSTOX_API_BASE=f"http://127.0.0.1:{args.fake_port}", UPSTOX_ACCESS_TOKEN="bench",
+               WATCHLIST_MAX_INSTRUMENTS=str(max(args.instruments, 1000)))
+    procs = []
+    ports = [args.app_port + i for i in range(max(args.workers, 1))]
+    if args.workers:
+        env["FEED_MODE"] = "redis"
+        procs.append(subprocess.Popen([sys.executable, "-m", "app.ingest"], env=env))
+    for port in ports:
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            env=env,
+        ))
+    app_urls = [f"http://127.0.0.1:{port}" for port in ports]
+    per_client = args.per_client or args.instruments
+    stats = {"subscribe": [], "latencies": [], "messages": 0, "updates": 0, "bytes": 0}
+    try:
+        for app_url in app_urls:
+            await wait_for_http(app_url + "/stats")
+        ready, stop = asyncio.Semaphore(0), asyncio.Event()
+        clients = []
+        for i in range(args.clients):
+            # Overlapping windows of the instrument list, so every instrument is watched
+            first = i * per_client % args.instruments
+            keys = [fake.instrument_keys[(first + j) % args.instruments] for j in range(per_client)]
+            url = f"ws://127.0.0.1:{ports[i % len(ports)]}/ws/watchlist?format={args.format}&timeframe={args.timeframe}"
+            clients.append(asyncio.create_task(run_client(url, keys, fake, stats, ready, stop)))
+        for _ in clients:
+            await ready.acquire()
+
+        # Let the app authorize and subscribe upstream before measuring
+        await asyncio.sleep(args.warmup)
+        stats.update(latencies=[], messages=0, updates=0, bytes=0)
+        frames_before = fake.frames_sent
+        stats_before = await fetch_stats(app_urls)
+        cpu_before = [process_cpu_seconds(proc.pid) for proc in procs]
+        started = time.perf_counter()
+
+        await asyncio.sleep(args.duration)
+
+        elapsed = time.perf_counter() - started
+        cpu_after = [process_cpu_seconds(proc.pid) for proc in procs]
+        stats_after = await fetch_stats(app_urls)
+        frames = fake.frames_sent - frames_before
+        stop.set()
+        await asyncio.gather(*clients, return_exceptions=True)
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+        fake_server.should_exit = True
+        await fake_task
+
+    subscribe_ms = np.asarray(stats["subscribe"]) * 1e3
+    print(f"{args.clients} clients x {per_client} instruments ({args.format}, {args.timeframe}); "
+          f"subscribe p50 {np.percentile(subscribe_ms, 50):.1f}ms max {subscribe_ms.max():.1f}ms")
+    print(f"{frames / elapsed:.2f} frames/s upstream, {stats['updates'] / elapsed:.0f} updates/s in "
+          f"{stats['messages'] / elapsed:.1f} messages/s to clients "
+          f"({stats['updates'] / max(stats['messages'], 1):.0f} updates, {stats['bytes'] / max(stats['messages'], 1) / 1024:.1f} KiB per message)")
+    if stats["latencies"]:
+        ms = np.asarray(stats["latencies"]) * 1e3
+        print("message latency ms: " + "  ".join(f"p{p} {np.percentile(ms, p):.2f}" for p in (50, 90, 99)) + f"  max {ms.max():.2f}")
+    if None not in cpu_before and None not in cpu_after:
+        shares = [(after - before) / elapsed * 100 for before, after in zip(cpu_before, cpu_after)]
+        print(f"app CPU: {sum(shares):.1f}% of one core (" + ", ".join(f"{share:.1f}%" for share in shares) + " per process)")
+    print("per-stage app time (share of wall clock):")
+    for label, name in STAGES:
+        before, after = stats_before.get(name), stats_after.get(name)
+        if not before or not after:
+            continue
+        spent = after["sum"] - before["sum"]
+        calls = after["count"] - before["count"]
+        if not calls:
+            continue
+        print(f"  {label:12s} {spent / elapsed * 100:6.2f}%  {calls:8d} calls  {spent / calls * 1e6:8.1f}us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instruments", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--per-client", type=int, default=0, help="instruments per client (0: all)")
+    parser.add_argument("--rate", type=float, default=1.0, help="synthetic upstream frames per second")
+    parser.add_argument("--format", choices=("json", "binary"), default="binary", help="client wire format")
+    parser.add_argument("--timeframe", default="1m")
+    parser.add_argument("--workers", type=int, default=0, help="web workers behind one ingestion worker (0: single local-mode app)")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Bytes per tick and server encode time of the JSON and binary live wire formats.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_wire_format --ticks 100000
+"""
+import argparse
+import json
+import random
+import time
+from app.wire import Update, encode_binary
+
+
+def synthetic_payloads(count, seed=9):
+    rng = random.Random(seed)
+    payloads = []
+    price = 2500.0
+    cvd = 0.0
+    for i in range(count):
+        ts = 1_700_000_000 + i * 60
+        price_open, price = price, price + rng.uniform(-3, 3)
+        cvd_open, cvd = cvd, cvd + rng.uniform(-5e4, 5e4)
+        signal = rng.choice((None, None, None, "BUY", "SELL"))
+        payloads.append({
+            "time": ts,
+            "price": {"time": ts, "open": price_open, "high": max(price_open, price) + 1, "low": min(price_open, price) - 1, "close": price},
+            "volume": {"time": ts, "open": cvd_open, "high": max(cvd_open, cvd), "low": min(cvd_open, cvd), "close": cvd},
+            "alert": {"signal": signal, "text": signal.lower()} if signal else None,
+        })
+    return payloads
+
+
+def measure(label, encode, payloads, batch):
+    updates = [Update("NSE_EQ|BENCH", payload) for payload in payloads]
+    total_bytes = 0
+    start = time.perf_counter()
+    for i in range(0, len(updates), batch):
+        total_bytes += len(encode(updates[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    print(f"{label:22s} {total_bytes / len(updates):7.1f} bytes/tick  {elapsed / len(updates) * 1e6:6.2f}us encode/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=100_000)
+    args = parser.parse_args()
+    payloads = synthetic_payloads(args.ticks)
+
+    measure("json", lambda updates: updates[0].json().encode(), payloads, 1)
+    measure("json (batch of 10)", lambda updates: json.dumps([u.payload for u in updates]).encode(), payloads, 10)
+    measure("binary", encode_binary, payloads, 1)
+    measure("binary (batch of 10)", encode_binary, payloads, 10)
+    measure("binary (batch of 64)", encode_binary, payloads, 64)
+
+
+if __name__ == "__main__":
+    main()
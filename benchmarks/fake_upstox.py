@@ -0,0 +1,139 @@
+"""
+A local stand-in for the Upstox authorize endpoint and market data websocket.
+
+It streams either a recording made with FEED_RECORD_PATH or synthetic
+full-mode FeedResponse frames. Point the app at it with
+UPSTOX_API_BASE=http://127.0.0.1:<port>.
+
+    python -m benchmarks.fake_upstox --port 9100 --instruments 50 --rate 20
+    python -m benchmarks.fake_upstox --port 9100 --replay feed.rec --speed 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+import uvicorn
+from app.feed_recorder import read_recording
+from app.websocket_stream import decode_protobuf, extract_minute_candles
+from benchmarks.bench_decode import build_full_feed_frame
+
+
+class FakeUpstox:
+    """
+    Serves frames to every connected feed client and remembers when each
+    candle timestamp was first sent, so a driver can measure end-to-end latency.
+
+    Args:
+        instruments (int): Synthetic instrument count (ignored when replaying)
+        rate (float): Synthetic frames per second
+        replay (str or None): Recording to stream instead of synthetic frames
+        speed (float): Replay speed multiplier; 0 streams as fast as possible
+    """
+
+    def __init__(self, instruments=50, rate=10.0, replay=None, speed=1.0, seed=1):
+        self.instrument_keys = [f"NSE_EQ|FAKE{i:04d}" for i in range(instruments)]
+        self.rate = rate
+        self.replay = list(read_recording(replay)) if replay else None
+        self.speed = speed
+        self.rng = random.Random(seed)
+        self.sent_at = {}
+        self.frames_sent = 0
+        self.app = self._build_app()
+
+    def _build_app(self):
+        app = FastAPI()
+
+        @app.get("/v3/feed/market-data-feed/authorize")
+        async def authorize(request: Request):
+            uri = f"ws://{request.url.netloc}/feed"
+            return {"status": "success", "data": {"authorized_redirect_uri": uri}}
+
+        @app.get("/v3/historical-candle/{path:path}")
+        async def historical(path: str):
+            return {"status": "success", "data": {"candles": []}}
+
+        @app.websocket("/feed")
+        async def feed(websocket: WebSocket):
+            await websocket.accept()
+            subscribed = set()
+            sender = asyncio.create_task(self._stream(websocket, subscribed))
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        break
+                    request = json.loads(message.get("bytes") or message.get("text"))
+                    keys = request["data"]["instrumentKeys"]
+                    if request["method"] == "sub":
+                        subscribed.update(keys)
+                    elif request["method"] == "unsub":
+                        subscribed.difference_update(keys)
+            except WebSocketDisconnect:
+                pass
+            finally:
+                sender.cancel()
+
+        return app
+
+    async def _stream(self, websocket, subscribed):
+        if self.replay is not None:
+            await self._stream_replay(websocket)
+            return
+
+        ts_ms = (int(time.time() * 1000) // 60_000) * 60_000
+        interval = 1.0 / self.rate
+        next_send = time.perf_counter()
+        while True:
+            keys = [key for key in self.instrument_keys if key in subscribed]
+            if not keys:
+                await asyncio.sleep(interval)
+                next_send = time.perf_counter()
+                continue
+            # Every synthetic frame carries a fresh minute, so each one yields a candle
+            ts_ms += 60_000
+            frame = build_full_feed_frame(keys, ts_ms, self.rng)
+            self.sent_at.setdefault(ts_ms // 1000, time.time())
+            await websocket.send_bytes(frame)
+            self.frames_sent += 1
+
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    async def _stream_replay(self, websocket):
+        frames = [(received_ns, frame, {candle[0] // 1000 for _, candle in extract_minute_candles(decode_protobuf(frame))})
+                  for received_ns, frame in self.replay]
+        if not frames:
+            return
+        first_ns = frames[0][0]
+        start = time.perf_counter()
+        for received_ns, frame, ts_secs in frames:
+            if self.speed > 0:
+                delay = (received_ns - first_ns) / 1e9 / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            now = time.time()
+            for ts_sec in ts_secs:
+                self.sent_at.setdefault(ts_sec, now)
+            await websocket.send_bytes(frame)
+            self.frames_sent += 1
+            if self.speed <= 0:
+                await asyncio.sleep(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--instruments", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=10.0, help="synthetic frames per second")
+    parser.add_argument("--replay", help="recording written via FEED_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    fake = FakeUpstox(args.instruments, args.rate, args.replay, args.speed)
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+from app import http_client
+
+
+class StubUpstox:
+    """
+    Answers Upstox REST requests from a queue of scripted replies: an int
+    status, a JSON body, or an exception to raise. Once the queue runs out
+    every request gets the last reply.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        if isinstance(reply, int):
+            return httpx.Response(reply, json={"status": "error"})
+        return httpx.Response(200, json=reply)
+
+
+@pytest.fixture
+def upstox(monkeypatch):
+    """
+    Points the shared http_client at a StubUpstox and records backoff delays
+    in upstox.sleeps instead of sleeping.
+    """
+    stub = StubUpstox()
+    stub.sleeps = []
+
+    async def sleep(delay):
+        stub.sleeps.append(delay)
+
+    client = httpx.AsyncClient(base_url=http_client.UPSTOX_API_BASE, transport=httpx.MockTransport(stub))
+    monkeypatch.setattr(http_client, "_client", client)
+    monkeypatch.setattr(http_client.asyncio, "sleep", sleep)
+    yield stub
+    http_client._client = None
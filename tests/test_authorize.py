@@ -0,0 +1,58 @@
+import asyncio
+import time
+import pytest
+from app import websocket_stream
+
+
+def authorized(uri):
+    return {"status": "success", "data": {"authorized_redirect_uri": uri}}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(websocket_stream, "_authorized_uri", None)
+    monkeypatch.setattr(websocket_stream, "_authorized_until", 0.0)
+
+
+def test_serves_cached_uri_within_ttl(upstox, monkeypatch):
+    monkeypatch.setattr(websocket_stream, "AUTHORIZE_TTL", 60.0)
+    upstox.replies = [authorized("wss://feed/1"), authorized("wss://feed/2")]
+    first = asyncio.run(websocket_stream.get_authorized_feed_uri())
+    second = asyncio.run(websocket_stream.get_authorized_feed_uri())
+    assert first == second == "wss://feed/1"
+    assert len(upstox.requests) == 1
+    assert upstox.requests[0].url.path == "/v3/feed/market-data-feed/authorize"
+
+
+def test_refetches_after_ttl(upstox, monkeypatch):
+    monkeypatch.setattr(websocket_stream, "AUTHORIZE_TTL", 0.05)
+    upstox.replies = [authorized("wss://feed/1"), authorized("wss://feed/2")]
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/1"
+    time.sleep(0.06)
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/2"
+    assert len(upstox.requests) == 2
+
+
+def test_refetches_after_invalidation(upstox, monkeypatch):
+    monkeypatch.setattr(websocket_stream, "AUTHORIZE_TTL", 60.0)
+    upstox.replies = [authorized("wss://feed/1"), authorized("wss://feed/2")]
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/1"
+    # What the feed does when the handshake on the cached URI fails
+    websocket_stream.invalidate_authorized_feed_uri()
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/2"
+    assert len(upstox.requests) == 2
+
+
+def test_failed_authorization_is_not_cached(upstox, monkeypatch):
+    monkeypatch.setattr(websocket_stream, "AUTHORIZE_TTL", 60.0)
+    upstox.replies = [{"status": "error", "errors": [{"message": "Invalid token"}]}, authorized("wss://feed/1")]
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) is None
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/1"
+    assert len(upstox.requests) == 2
+
+
+def test_authorize_retries_5xx(upstox, monkeypatch):
+    monkeypatch.setattr(websocket_stream, "AUTHORIZE_TTL", 60.0)
+    upstox.replies = [503, authorized("wss://feed/1")]
+    assert asyncio.run(websocket_stream.get_authorized_feed_uri()) == "wss://feed/1"
+    assert len(upstox.sleeps) == 1
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app import candle_cache
+from app.candle_cache import CandleCache
+
+
+@pytest.mark.parametrize("to_date, from_date", [
+    ("2025-01-01", "2025-01-05"),
+    ("2025-01-05", "yesterday"),
+    ("05/01/2025", "2025-01-01"),
+    ("", ""),
+])
+def test_invalid_range_gives_no_data(to_date, from_date):
+    # Rejected before any Redis or Upstox call
+    cache = CandleCache(client=None)
+    assert asyncio.run(cache.get_candles("NSE_EQ|INE002A01018", "minutes", 1, to_date, from_date)) is None
+
+
+class DownRedis:
+    """
+    Stands in for a Redis server that refuses every command.
+    """
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise RedisConnectionError("Connection refused")
+        return command
+
+
+def test_falls_back_to_upstox_without_redis(monkeypatch):
+    calls = []
+
+    async def fetch_candle_data(instrument_key, unit, interval, to_date, from_date):
+        calls.append((to_date, from_date))
+        return {"status": "success", "data": {"candles": []}}
+
+    monkeypatch.setattr(candle_cache, "fetch_candle_data", fetch_candle_data)
+    cache = CandleCache(client=DownRedis())
+    data = asyncio.run(cache.get_candles("NSE_EQ|INE002A01018", "minutes", 1, "2025-01-05", "2025-01-01"))
+    assert data == {"status": "success", "data": {"candles": []}}
+    assert calls == [("2025-01-05", "2025-01-01")]
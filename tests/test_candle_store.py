@@ -0,0 +1,51 @@
+import pytest
+from app.candle_store import CandleStore, parse_retention
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.writes = []
+
+    def enqueue(self, write):
+        self.writes.append(write)
+
+
+def upsert_args(store, instrument_key, monkeypatch):
+    from app import candle_store as module
+    captured = []
+    monkeypatch.setattr(module, "upsert_script", lambda keys, args, client: captured.append(args))
+    payload = {
+        "time": 1_700_000_040,
+        "price": {"open": 1, "high": 2, "low": 0.5, "close": 1.5},
+        "volume": {"open": 0, "high": 10, "low": 0, "close": 10},
+        "alert": None,
+    }
+    store.upsert(instrument_key, payload)
+    store.writer.writes[-1](None)
+    _, _, max_count, max_age = captured[-1]
+    return max_count, max_age
+
+
+def test_configured_retention_applies_per_instrument(monkeypatch):
+    retention = parse_retention('{"NSE_EQ|A": {"max_candles": 100000, "max_age": 0}, "NSE_EQ|B": {"max_age": 3600}}')
+    store = CandleStore(client=None, writer=RecordingWriter(), max_candles=20000, max_age=86400, retention=retention)
+    assert upsert_args(store, "NSE_EQ|A", monkeypatch) == (100000, 0)
+    assert upsert_args(store, "NSE_EQ|B", monkeypatch) == (20000, 3600)
+    assert upsert_args(store, "NSE_EQ|C", monkeypatch) == (20000, 86400)
+
+
+def test_empty_retention_config():
+    assert parse_retention("") == {}
+
+
+@pytest.mark.parametrize("text", [
+    "not json",
+    '["NSE_EQ|A"]',
+    '{"NSE_EQ|A": 100}',
+    '{"NSE_EQ|A": {"max_rows": 100}}',
+    '{"NSE_EQ|A": {"max_candles": -1}}',
+    '{"NSE_EQ|A": {"max_age": "1d"}}',
+])
+def test_invalid_retention_config(text):
+    with pytest.raises(ValueError):
+        parse_retention(text)
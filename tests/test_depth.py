@@ -0,0 +1,16 @@
+from app import websocket_stream
+from app.depth import InstrumentDepth
+from app.signal_engine import STRATEGIES
+from app.websocket_stream import InstrumentState
+
+
+def test_depth_only_for_strategies_that_need_it(monkeypatch):
+    monkeypatch.setattr(websocket_stream, "DEPTH_ENABLED", False)
+    assert InstrumentState(STRATEGIES["cvd_engulfing"]).depth is None
+    assert InstrumentState(STRATEGIES["ema_cross_vwap"]).depth is None
+    assert isinstance(InstrumentState(STRATEGIES["tick_cvd_imbalance"]).depth, InstrumentDepth)
+
+
+def test_depth_forced_on(monkeypatch):
+    monkeypatch.setattr(websocket_stream, "DEPTH_ENABLED", True)
+    assert isinstance(InstrumentState(STRATEGIES["cvd_engulfing"]).depth, InstrumentDepth)
@@ -0,0 +1,217 @@
+import asyncio
+import json
+from app import feed_manager
+from app.feed_manager import UpstreamFeed
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def make_feed(monkeypatch):
+    async def run(self):
+        pass
+
+    monkeypatch.setattr(UpstreamFeed, "_run", run)
+    feed = UpstreamFeed(on_update=lambda update: None)
+    feed._upstream = FakeUpstream()
+    return feed
+
+
+def test_unwatched_while_seeding_is_not_subscribed(monkeypatch):
+    feed = make_feed(monkeypatch)
+    seeding = asyncio.Event()
+    release = asyncio.Event()
+
+    async def seed(self, instrument_keys):
+        seeding.set()
+        await release.wait()
+
+    monkeypatch.setattr(UpstreamFeed, "_seed", seed)
+
+    async def scenario():
+        feed.states["NSE_EQ|KEEP"] = feed_manager.InstrumentState()
+        watch = asyncio.create_task(feed.watch(["NSE_EQ|A", "NSE_EQ|B"]))
+        await seeding.wait()
+        await feed.unwatch(["NSE_EQ|A"])
+        release.set()
+        await watch
+
+    asyncio.run(scenario())
+    subs = [message["data"]["instrumentKeys"] for message in feed._upstream.sent if message["method"] == "sub"]
+    assert subs == [["NSE_EQ|B"]]
+    assert set(feed.states) == {"NSE_EQ|KEEP", "NSE_EQ|B"}
+
+
+def test_reconnect_cancels_running_backfill(monkeypatch):
+    feed = make_feed(monkeypatch)
+    processed = []
+    monkeypatch.setattr(feed, "_process", lambda key, state, candle: processed.append((key, candle[0])))
+    calls = []
+    first_fetch = asyncio.Event()
+
+    async def fetch_missing_candles(instrument_key, after_ms):
+        calls.append(after_ms)
+        if len(calls) == 1:
+            first_fetch.set()
+            await asyncio.Event().wait()
+        return [(after_ms + 60_000, 1, 1, 1, 1, 1)]
+
+    monkeypatch.setattr(feed_manager, "fetch_missing_candles", fetch_missing_candles)
+
+    async def scenario():
+        state = feed.states["NSE_EQ|A"] = feed_manager.InstrumentState()
+        state.last_received_ts_ms = 0
+        feed._start_backfill()
+        first = feed._backfill_task
+        await first_fetch.wait()
+        # A live candle parked while the first backfill is fetching
+        state.backlog.append((120_000, 1, 1, 1, 1, 1))
+
+        feed._start_backfill()
+        await feed._backfill_task
+        assert first.cancelled()
+        assert state.backlog is None
+
+    asyncio.run(scenario())
+    # The second backfill refetches the whole gap from the last processed candle
+    assert calls == [0, 0]
+    assert processed == [("NSE_EQ|A", 60_000)]
+
+
+def test_backfill_parks_live_candles_before_it_runs(monkeypatch):
+    feed = make_feed(monkeypatch)
+    processed = []
+    monkeypatch.setattr(feed, "_process", lambda key, state, candle: processed.append(candle[0]))
+    calls = []
+
+    async def fetch_missing_candles(instrument_key, after_ms):
+        calls.append(after_ms)
+        return [(60_000, 1, 1, 1, 1, 1), (120_000, 1, 1, 1, 1, 1), (180_000, 1, 1, 1, 1, 1)]
+
+    monkeypatch.setattr(feed_manager, "fetch_missing_candles", fetch_missing_candles)
+
+    async def scenario():
+        state = feed.states["NSE_EQ|A"] = feed_manager.InstrumentState()
+        state.last_received_ts_ms = 0
+        feed._start_backfill()
+        # The reconnect's first frame is handled before the backfill task runs
+        assert state.backlog == []
+        state.backlog.append((180_000, 1, 1, 1, 1, 1))
+        await feed._backfill_task
+        assert state.backlog is None
+
+    asyncio.run(scenario())
+    assert calls == [0]
+    assert processed == [60_000, 120_000, 180_000]
+
+
+class StubSource:
+    def __init__(self):
+        self.watches = []
+        self.unwatches = []
+        self.release = asyncio.Event()
+        self.fail = True
+
+    async def watch(self, instrument_keys):
+        self.watches.append(list(instrument_keys))
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("redis down")
+
+    async def unwatch(self, instrument_keys):
+        self.unwatches.append(list(instrument_keys))
+
+
+def make_manager():
+    manager = feed_manager.FeedManager()
+    manager.source = StubSource()
+    return manager
+
+
+def test_concurrent_attachers_fail_with_the_watch():
+    manager = make_manager()
+
+    async def scenario():
+        first, second = manager.open_channel(), manager.open_channel()
+        attaches = [asyncio.create_task(manager.attach(queue, ["X"])) for queue in (first, second)]
+        await asyncio.sleep(0)
+        manager.source.release.set()
+        results = await asyncio.gather(*attaches, return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert manager.subscribers == {}
+
+        # The next subscriber watches again
+        manager.source.fail = False
+        third = manager.open_channel()
+        await manager.attach(third, ["X"])
+        assert manager.channels("X") == {third}
+
+    asyncio.run(scenario())
+    assert manager.source.watches == [["X"], ["X"]]
+
+
+def test_concurrent_attachers_wait_for_the_watch():
+    manager = make_manager()
+    manager.source.fail = False
+
+    async def scenario():
+        first, second = manager.open_channel(), manager.open_channel()
+        attach_first = asyncio.create_task(manager.attach(first, ["X"]))
+        await asyncio.sleep(0)
+        attach_second = asyncio.create_task(manager.attach(second, ["X"]))
+        await asyncio.sleep(0)
+        assert not attach_second.done()
+        manager.source.release.set()
+        await asyncio.gather(attach_first, attach_second)
+        assert manager.channels("X") == {first, second}
+
+    asyncio.run(scenario())
+    assert manager.source.watches == [["X"]]
+
+
+def test_unwatched_once_everyone_left_during_the_watch():
+    manager = make_manager()
+    manager.source.fail = False
+
+    async def scenario():
+        queue = manager.open_channel()
+        attach = asyncio.create_task(manager.attach(queue, ["X"]))
+        await asyncio.sleep(0)
+        attach.cancel()
+        await asyncio.gather(attach, return_exceptions=True)
+        assert manager.subscribers == {}
+        manager.source.release.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert manager.source.unwatches == [["X"]]
+
+
+def test_supervisor_survives_unexpected_errors(monkeypatch):
+    from websockets.exceptions import InvalidURI
+
+    feed = UpstreamFeed(on_update=lambda update: None)
+    feed.states["NSE_EQ|A"] = feed_manager.InstrumentState()
+    errors = [InvalidURI("ws://", "bad"), asyncio.TimeoutError(), RuntimeError("decoder bug")]
+
+    async def authorize():
+        return "ws://upstream"
+
+    def connect(uri):
+        if errors:
+            raise errors.pop(0)
+        # Give up watching after the third failure
+        feed.states.clear()
+        raise OSError("refused")
+
+    monkeypatch.setattr(feed_manager, "get_authorized_feed_uri", authorize)
+    monkeypatch.setattr(feed_manager, "connect_market_feed", connect)
+    monkeypatch.setattr(feed_manager, "RECONNECT_BASE_DELAY", 0)
+    asyncio.run(feed._run())
+    assert errors == []
@@ -0,0 +1,100 @@
+import asyncio
+import httpx
+import pytest
+from app import http_client, upstox_api
+
+CANDLES = {"status": "success", "data": {"candles": [["2025-01-01T09:15:00+05:30", 1, 2, 0.5, 1.5, 100, 0]]}}
+
+
+def test_success_is_not_retried(upstox):
+    upstox.replies = [CANDLES]
+    response = asyncio.run(http_client.get("/v3/ping", retries=3))
+    assert response.json() == CANDLES
+    assert len(upstox.requests) == 1
+    assert upstox.sleeps == []
+
+
+@pytest.mark.parametrize("status", sorted(http_client.RETRY_STATUSES))
+def test_retries_throttled_and_5xx(upstox, status):
+    upstox.replies = [status, status, CANDLES]
+    response = asyncio.run(http_client.get("/v3/ping", retries=3, backoff=0.5))
+    assert response.status_code == 200
+    assert len(upstox.requests) == 3
+    assert len(upstox.sleeps) == 2
+
+
+def test_backoff_doubles_with_jitter(upstox):
+    upstox.replies = [503]
+    response = asyncio.run(http_client.get("/v3/ping", retries=3, backoff=0.5))
+    # The last response is returned once the retries are spent
+    assert response.status_code == 503
+    assert len(upstox.requests) == 4
+    assert len(upstox.sleeps) == 3
+    for attempt, delay in enumerate(upstox.sleeps):
+        base = 0.5 * 2 ** attempt
+        assert base <= delay <= base * 1.25
+
+
+def test_client_errors_are_not_retried(upstox):
+    upstox.replies = [404]
+    response = asyncio.run(http_client.get("/v3/ping", retries=3))
+    assert response.status_code == 404
+    assert len(upstox.requests) == 1
+
+
+def test_retries_connect_errors(upstox):
+    upstox.replies = [httpx.ConnectError("refused"), httpx.ConnectError("refused"), CANDLES]
+    response = asyncio.run(http_client.get("/v3/ping", retries=3))
+    assert response.json() == CANDLES
+    assert len(upstox.requests) == 3
+    assert len(upstox.sleeps) == 2
+
+
+def test_connect_error_raised_after_last_retry(upstox):
+    upstox.replies = [httpx.ConnectError("refused")]
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(http_client.get("/v3/ping", retries=2))
+    assert len(upstox.requests) == 3
+    assert len(upstox.sleeps) == 2
+
+
+def test_timeout_is_retried_then_raised(upstox):
+    upstox.replies = [httpx.ReadTimeout("slow")]
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(http_client.get("/v3/ping", retries=1))
+    assert len(upstox.requests) == 2
+
+
+def test_timeout_then_recovery(upstox):
+    upstox.replies = [httpx.ConnectTimeout("slow"), CANDLES]
+    response = asyncio.run(http_client.get("/v3/ping", retries=1))
+    assert response.json() == CANDLES
+
+
+def test_shared_client_uses_configured_timeout():
+    client = http_client.get_client()
+    try:
+        assert client.timeout == httpx.Timeout(http_client.HTTP_TIMEOUT)
+        assert http_client.get_client() is client
+    finally:
+        asyncio.run(http_client.close())
+
+
+def test_fetch_candle_data(upstox):
+    upstox.replies = [502, CANDLES]
+    data = asyncio.run(upstox_api.fetch_candle_data("NSE_EQ|INE002A01018", "minutes", "1", "2025-01-02", "2025-01-01"))
+    assert data == CANDLES
+    assert upstox.requests[-1].url.path == "/v3/historical-candle/NSE_EQ|INE002A01018/minutes/1/2025-01-02/2025-01-01"
+    assert upstox.requests[-1].headers["Authorization"].startswith("Bearer ")
+
+
+def test_fetch_candle_data_gives_none_on_timeout(upstox):
+    upstox.replies = [httpx.ReadTimeout("slow")]
+    assert asyncio.run(upstox_api.fetch_candle_data("NSE_EQ|INE002A01018", "minutes", "1", "2025-01-02", "2025-01-01")) is None
+    assert len(upstox.requests) == http_client.HTTP_RETRIES + 1
+
+
+def test_fetch_intraday_gives_none_on_persistent_5xx(upstox):
+    upstox.replies = [500]
+    assert asyncio.run(upstox_api.fetch_intraday_candle_data("NSE_EQ|INE002A01018", "minutes", "1")) is None
+    assert len(upstox.requests) == http_client.HTTP_RETRIES + 1
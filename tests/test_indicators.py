@@ -0,0 +1,27 @@
+import numpy as np
+from app.indicators import ATR, EMA, RSI, atr_batch, ema_batch, rsi_batch
+
+
+def candles(count=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, count))
+    # Flat stretches, where rounding differences would flip EMA crossover ties
+    close[500:600] = close[499]
+    high = close + rng.random(count)
+    low = close - rng.random(count)
+    return high, low, close
+
+
+def replay(indicator, high, low, close):
+    return np.asarray([indicator.update((0, c, h, l, c, 0.0)) for h, l, c in zip(high, low, close)], dtype=float)
+
+
+def test_batch_smoothing_matches_live_exactly():
+    high, low, close = candles()
+    assert np.array_equal(ema_batch(close, 9), replay(EMA(9), high, low, close))
+    assert np.array_equal(atr_batch(high, low, close, 14), replay(ATR(14), high, low, close))
+    assert np.array_equal(rsi_batch(close, 14), replay(RSI(14), high, low, close), equal_nan=True)
+
+
+def test_empty_series():
+    assert ema_batch([]).shape == (0,)
@@ -0,0 +1,87 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import routes
+
+CANDLE = {
+    "time": 1_700_000_040,
+    "price": {"time": 1_700_000_040, "open": 1, "high": 2, "low": 0.5, "close": 1.5},
+    "volume": {"time": 1_700_000_040, "open": 0, "high": 10, "low": 0, "close": 10},
+    "alert": None,
+}
+
+
+class StubSource:
+    def __init__(self):
+        self.fail = True
+        self.watched = set()
+
+    async def watch(self, instrument_keys):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.watched.update(instrument_keys)
+
+    async def unwatch(self, instrument_keys):
+        self.watched.difference_update(instrument_keys)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    source = StubSource()
+
+    async def get_many(instrument_keys, limit=None, timeframe=None, **kwargs):
+        return {key: [CANDLE] for key in instrument_keys}
+
+    monkeypatch.setattr(routes.feed_manager, "source", source)
+    monkeypatch.setattr(routes.candle_store, "get_many", get_many)
+    app = FastAPI()
+    app.include_router(routes.router)
+    with TestClient(app) as client:
+        client.source = source
+        yield client
+
+
+def test_failed_subscribe_is_reported_and_socket_stays_open(client):
+    with client.websocket_connect("/ws/watchlist") as ws:
+        ws.send_text(json.dumps({"action": "subscribe", "instruments": ["NSE_EQ|A"]}))
+        assert ws.receive_json()["type"] == "error"
+        assert routes.feed_manager.subscribers == {}
+
+        client.source.fail = False
+        ws.send_text(json.dumps({"action": "subscribe", "instruments": ["NSE_EQ|A"]}))
+        assert ws.receive_json() == {"type": "subscribed", "instruments": {"NSE_EQ|A": 0}}
+        # The latest stored candle follows the reply
+        message = ws.receive_json()
+        assert message["type"] == "updates"
+        assert message["updates"][0][0] == "NSE_EQ|A"
+        assert message["updates"][0][1]["time"] == CANDLE["time"]
+    assert client.source.watched == set()
+
+
+class VanishedClient:
+    async def send_text(self, text):
+        raise OSError("Broken pipe")
+
+    async def send_bytes(self, data):
+        raise OSError("Broken pipe")
+
+
+def test_failed_send_detaches_the_channel(monkeypatch):
+    import asyncio
+    from app.wire import Update
+
+    source = StubSource()
+    source.fail = False
+    monkeypatch.setattr(routes.feed_manager, "source", source)
+
+    async def scenario():
+        queue = routes.feed_manager.open_channel()
+        await routes.feed_manager.attach(queue, ["NSE_EQ|A"])
+        queue.push(Update("NSE_EQ|A", CANDLE))
+        # Returns instead of leaving an unretrieved task exception
+        await routes.forward_updates(VanishedClient(), queue)
+        assert routes.feed_manager.channels() == set()
+
+    asyncio.run(scenario())
+    assert source.watched == set()